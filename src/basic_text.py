@@ -2,6 +2,86 @@
 # -*- coding: UTF-8 -*-
 # Low-level functions that cannot use logging
 
+import unicodedata
+
+# Joiners and variation selectors stick to the preceding symbol
+JOINERS = ('\u200d', '\ufe0e', '\ufe0f')
+
+
+def get_clusters(text):
+    ''' Split text into user-perceived symbols (approximately): a base symbol
+        followed by combining marks, variation selectors and ZWJ sequences.
+    '''
+    cluster = ''
+    Join = False
+    for sym in text:
+        if cluster and (Join or sym in JOINERS or unicodedata.combining(sym)):
+            cluster += sym
+            Join = sym == '\u200d'
+            continue
+        if cluster:
+            yield cluster
+        cluster = sym
+        Join = False
+    if cluster:
+        yield cluster
+
+
+def get_sym_width(cluster):
+    # Wide and fullwidth East Asian symbols take 2 columns in a monospace font
+    if unicodedata.east_asian_width(cluster[0]) in ('W', 'F'):
+        return 2
+    return 1
+
+
+def get_width(text):
+    # Return the number of columns the text takes in a monospace font
+    if text.isascii():
+        return len(text)
+    return sum([get_sym_width(cluster) for cluster in get_clusters(text)])
+
+
+def cut_width(text, width, FromEnd=False):
+    # Cut text to 'width' columns without splitting symbols
+    clusters = list(get_clusters(text))
+    if FromEnd:
+        clusters.reverse()
+    result = []
+    for cluster in clusters:
+        width -= get_sym_width(cluster)
+        if width < 0:
+            break
+        result.append(cluster)
+    if FromEnd:
+        result.reverse()
+    return ''.join(result)
+
+
+def shorten(text, limit=10, CutStart=False, ShowGap=True, encloser=''
+           ,Display=False):
+    ''' A fast path for 'Shorten': short texts are returned untouched without
+        creating objects. Set 'Display' to measure text in monospace columns
+        instead of code points.
+    '''
+    if not isinstance(text, str):
+        text = str(text)
+    if limit == 0:
+        return text
+    if not encloser:
+        if Display:
+            if text.isascii() and len(text) <= limit:
+                return text
+        elif len(text) <= limit:
+            return text
+    return Shorten(text, limit, CutStart, ShowGap, encloser, Display).run()
+
+
+def shorten_many(texts, limit=10, CutStart=False, ShowGap=True, encloser=''
+                ,Display=False):
+    # Shorten a column of texts
+    return [shorten(text, limit, CutStart, ShowGap, encloser, Display) \
+            for text in texts]
+
 
 class Enclose:
     
@@ -30,13 +110,20 @@ class Enclose:
 
 class Shorten:
 
-    def __init__(self, text, limit=10, CutStart=False, ShowGap=True, encloser=''):
+    def __init__(self, text, limit=10, CutStart=False, ShowGap=True, encloser=''
+                ,Display=False):
         self.gap = ''
         self.text = str(text)
         self.limit = limit
         self.CutStart = CutStart
         self.ShowGap = ShowGap
         self.encloser = str(encloser)
+        self.Display = Display
+    
+    def get_len(self):
+        if self.Display:
+            return get_width(self.text)
+        return len(self.text)
     
     def enclose(self):
         ''' Currently, 'Enclose' works with empty strings, but we want to
@@ -53,13 +140,19 @@ class Shorten:
         self.limit -= 3
     
     def add_gap(self):
-        if self.CutStart:
+        if self.Display:
+            self.text = cut_width(self.text, self.limit, self.CutStart)
+            if self.CutStart:
+                self.text = self.gap + self.text
+            else:
+                self.text += self.gap
+        elif self.CutStart:
             self.text = self.gap + self.text[len(self.text) - self.limit:]
         else:
             self.text = self.text[0:self.limit] + self.gap
     
     def shorten(self):
-        if len(self.text) <= self.limit:
+        if self.get_len() <= self.limit:
             return
         if self.encloser:
             enc_len = 2 * len(self.encloser)
@@ -84,3 +177,5 @@ if __name__ == '__main__':
     encloser = '«'
     text = Shorten(text, limit, CutStart, ShowGap, encloser).run()
     print(f'[{text}]')
+    text = shorten('日本語のテキストです', limit, Display=True)
+    print(f'[{text}]')
@@ -4,7 +4,6 @@
 import os
 import copy
 import json
-import jsonschema
 
 from skl_shared_qt.localize import _
 from skl_shared_qt.message.controller import Message, rep
@@ -21,6 +20,10 @@ from skl_shared_qt.text_file import Read, Write
     will have to try-except all config values otherwise.
 '''
 
+# JSON schema types that can be coerced to Python types (numbers include
+# integers)
+TYPES = {'integer': int, 'number': (int, float), 'string': str, 'boolean': bool}
+
 
 class Json:
     
@@ -39,6 +42,8 @@ class Json:
         if not self.json or not schema:
             rep.empty(f)
             return
+        # This is slow to import and is not needed if there is no schema
+        import jsonschema
         # Setting empty schema passes validation
         try:
             jsonschema.validate(self.json, schema)
@@ -89,7 +94,8 @@ class Json:
         if not code:
             rep.empty(f)
             return
-        return Write(self.file, True).write(code)
+        # Do not let a crash truncate the config
+        return Write(self.file, True, Atomic=True).write(code)
 
 
 
@@ -168,11 +174,11 @@ class Default:
         if not self.Success:
             rep.cancel(f)
             return 0
-        try:
-            return self.iconfig.json['config']['min_version']
-        except KeyError:
+        version = MIN_VERSION.get(self.iconfig.json)
+        if version is None:
             self.Success = False
             return 0
+        return version
     
     def validate(self):
         f = '[SharedQt] config.Default.validate'
@@ -224,11 +230,11 @@ class Local:
         self.Success = self.iconfig.Success
     
     def get_version(self):
-        try:
-            return self.iconfig.json['config']['min_version']
-        except KeyError:
+        version = MIN_VERSION.get(self.iconfig.json)
+        if version is None:
             self.Success = False
             return 0
+        return version
     
     def check_version(self):
         f = '[SharedQt] config.Local.check_version'
@@ -240,36 +246,32 @@ class Local:
             config without checking key existence (but will require more effort
             in maintaining schemas).
         '''
-        if not 'config' in self.iconfig.json:
-            self.Success = False
-            mes = _('Configuration file "{}" does not have key "{}"!')
-            mes = mes.format(self.iconfig.file, 'config')
-            Message(f, mes).show_warning()
-            return
-        if not isinstance(self.iconfig.json['config'], dict):
-            self.Success = False
-            mes = _('Configuration file "{}": key "{}" has a wrong type!')
-            mes = mes.format(self.iconfig.file)
-            Message(f, mes, True).show_warning()
-            return
-        if not 'min_version' in self.iconfig.json['config']:
-            self.Success = False
-            mes = _('Configuration file "{}" does not have key "{}"!')
-            mes = mes.format(self.iconfig.file, "['config']['min_version']")
-            Message(f, mes, True).show_warning()
-            return
-        if not isinstance(self.iconfig.json['config']['min_version'], int):
+        value = self.iconfig.json
+        for depth in range(1, len(MIN_VERSION.keys) + 1):
+            key = MIN_VERSION.keys[depth-1]
+            if not isinstance(value, dict):
+                self.Success = False
+                mes = _('Configuration file "{}": key "{}" has a wrong type!')
+                mes = mes.format(self.iconfig.file, MIN_VERSION.get_title(depth-1))
+                Message(f, mes, True).show_warning()
+                return
+            if not key in value:
+                self.Success = False
+                mes = _('Configuration file "{}" does not have key "{}"!')
+                mes = mes.format(self.iconfig.file, MIN_VERSION.get_title(depth))
+                Message(f, mes, True).show_warning()
+                return
+            value = value[key]
+        if not isinstance(value, int):
             self.Success = False
             mes = _('Configuration file "{}": key "{}" has a wrong type!')
-            mes = mes.format(self.iconfig.file, "['config']['min_version']")
+            mes = mes.format(self.iconfig.file, MIN_VERSION.get_title())
             Message(f, mes, True).show_warning()
             return
-        if self.iconfig.json['config']['min_version'] != self.min_version:
+        if value != self.min_version:
             self.Success = False
             mes = _('Wrong version {}, expected {}!')
-            mes = mes.format (self.iconfig.json['config']['min_version']
-                             ,self.min_version
-                             )
+            mes = mes.format(value, self.min_version)
             Message(f, mes, True).show_warning()
     
     def save(self, obj):
@@ -297,6 +299,7 @@ class Config:
         self.local = ''
         self.new = {}
         self.local_dump = ''
+        self.iaccess = None
     
     def set_local_dump(self):
         f = '[SharedQt] config.Config.set_local_dump'
@@ -321,6 +324,23 @@ class Config:
             self._copy()
         Message(f, mes).show_info()
     
+    def set_accessor(self):
+        f = '[SharedQt] config.Config.set_accessor'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        self.iaccess = Accessor(self.new, self.ischema.get()).run()
+    
+    def get_accessor(self):
+        # Typed access to config values, e.g., 'get_accessor().get_section()'
+        f = '[SharedQt] config.Config.get_accessor'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        if self.iaccess is None:
+            self.set_accessor()
+        return self.iaccess
+    
     def load(self):
         f = '[SharedQt] config.Config.load'
         if not self.Success:
@@ -368,6 +388,7 @@ class Config:
         self.Success = self.ilocal.save(self.new)
     
     def run(self):
+        # The accessor is created by 'get_accessor' when it is needed
         self.load()
         self.update()
 
@@ -393,10 +414,8 @@ class Update:
 
     def report(self):
         f = '[SharedQt] config.Update.report'
-        mes = _('Modified keys: {}').format(self.mod_keys)
-        Message(f, mes).show_info()
-        mes = _('New keys: {}').format(self.new_keys)
-        Message(f, mes).show_info()
+        Message(f, _('Modified keys: {}'), args=(self.mod_keys,)).show_info()
+        Message(f, _('New keys: {}'), args=(self.new_keys,)).show_info()
     
     def debug(self):
         f = '[SharedQt] config.Update.debug'
@@ -408,14 +427,15 @@ class Update:
     
     def iterate(self, section1, section2):
         f = '[SharedQt] config.Update.iterate'
+        # Messages are formatted only if debug messages are enabled
         for key2 in section2:
             if not key2 in section1:
                 if isinstance(section2[key2], dict):
-                    mes = _('New branch: "{}"').format(key2)
+                    mes = _('New branch: "{}"')
                 else:
-                    mes = _('New value: "{}"').format(key2)
+                    mes = _('New value: "{}"')
                 self.new_keys += 1
-                Message(f, mes).show_debug()
+                Message(f, mes, args=(key2,)).show_debug()
                 section1[key2] = section2[key2]
         for key1 in section1:
             if not key1 in section2:
@@ -426,19 +446,188 @@ class Update:
                 if not section1[key1]:
                     self.mod_keys += 1
                     mes = _('Overwrite empty "{}" branch with "{}"')
-                    mes = mes.format(key1, section2[key1])
-                    Message(f, mes).show_debug()
+                    Message(f, mes, args=(key1, section2[key1])).show_debug()
                     section1[key1] = section2[key1]
                     continue
                 self.iterate(section1[key1], section2[key1])
             elif section1[key1] != section2[key1]:
                 self.mod_keys += 1
                 mes = _('Update "{}" branch value: {} -> {}')
-                mes = mes.format(key1, section1[key1], section2[key1])
-                Message(f, mes).show_debug()
+                args = (key1, section1[key1], section2[key1])
+                Message(f, mes, args=args).show_debug()
                 section1[key1] = section2[key1]
     
     def run(self):
         self.iterate(self.new, self.d2)
         self.report()
         return self.new
+
+
+class KeyPath:
+    ''' A precompiled path to a nested config value. Use it instead of
+        scattered 'json['config']['min_version']' lookups, e.g.:
+        MIN_VERSION = KeyPath('config.min_version'); MIN_VERSION.get(json, 0)
+    '''
+    def __init__(self, path, sep='.'):
+        if isinstance(path, str):
+            self.keys = tuple(path.split(sep))
+        else:
+            self.keys = tuple(path)
+    
+    def get_title(self, depth=0):
+        # Get a readable key title such as "['config']['min_version']"
+        if depth <= 0:
+            depth = len(self.keys)
+        return ''.join([f"['{key}']" for key in self.keys[:depth]])
+    
+    def get(self, json, default=None):
+        try:
+            for key in self.keys:
+                json = json[key]
+        except (KeyError, IndexError, TypeError):
+            return default
+        return json
+    
+    def set(self, json, value):
+        for key in self.keys[:-1]:
+            json = json[key]
+        json[self.keys[-1]] = value
+
+
+
+class Section:
+    ''' Provide an attribute access to a config branch, e.g.,
+        'Section(json).config.min_version'. Nested branches are wrapped only
+        once; leaf values are read from the (mutable) dictionary directly.
+    '''
+    def __init__(self, json):
+        self._json = json
+    
+    def __getattr__(self, key):
+        # This is called only if 'key' is not in 'self.__dict__'
+        try:
+            value = self.__dict__['_json'][key]
+        except KeyError:
+            raise AttributeError(key)
+        if isinstance(value, dict):
+            value = Section(value)
+            self.__dict__[key] = value
+        return value
+    
+    def __getitem__(self, key):
+        return self._json[key]
+    
+    def __contains__(self, key):
+        return key in self._json
+
+
+
+class Accessor:
+    ''' Compile key paths from the schema loaded in 'Schema' and coerce config
+        values to schema types once at load so that callers do not need to
+        check types each time they read a value. Only strings are converted
+        (e.g., "2" for an integer); JSON numbers include integers.
+    '''
+    def __init__(self, json, schema):
+        self.Success = True
+        self.json = json
+        self.schema = schema
+        # {KeyPath.keys: Python type}
+        self.types = {}
+        # {KeyPath.keys: KeyPath}
+        self.paths = {}
+        self.section = None
+    
+    def _compile(self, schema, keys):
+        if not isinstance(schema, dict):
+            return
+        type_ = schema.get('type')
+        if isinstance(type_, str) and type_ in TYPES and keys:
+            self.types[keys] = TYPES[type_]
+        properties = schema.get('properties')
+        if not isinstance(properties, dict):
+            return
+        for key in properties:
+            self._compile(properties[key], keys + (key,))
+    
+    def compile(self):
+        f = '[SharedQt] config.Accessor.compile'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        if not self.json:
+            self.Success = False
+            rep.empty(f)
+            return
+        # Setting empty schema is allowed, there will be nothing to coerce
+        self._compile(self.schema, ())
+        for keys in self.types:
+            self.paths[keys] = KeyPath(keys)
+    
+    def _coerce(self, value, type_):
+        # Only strings are converted, other values are kept as is
+        if not isinstance(value, str):
+            raise TypeError(value)
+        if type_ is bool:
+            if value.lower() in ('true', 'false'):
+                return value.lower() == 'true'
+            raise ValueError(value)
+        if type_ == (int, float):
+            try:
+                return int(value)
+            except ValueError:
+                return float(value)
+        return type_(value)
+    
+    def _is_typed(self, value, type_):
+        if type_ is bool:
+            return isinstance(value, bool)
+        return isinstance(value, type_) and not isinstance(value, bool)
+    
+    def coerce(self):
+        f = '[SharedQt] config.Accessor.coerce'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        count = 0
+        for keys, type_ in self.types.items():
+            ipath = self.paths[keys]
+            value = ipath.get(self.json)
+            if value is None or self._is_typed(value, type_):
+                continue
+            try:
+                ipath.set(self.json, self._coerce(value, type_))
+                count += 1
+            except (ValueError, TypeError):
+                mes = _('Configuration file: key "{}" has a wrong type!')
+                mes = mes.format(ipath.get_title())
+                Message(f, mes).show_warning()
+        if count:
+            mes = _('Coerced keys: {}').format(count)
+            Message(f, mes).show_debug()
+    
+    def get_path(self, path):
+        # Return a cached precompiled path, e.g., for 'config.min_version'
+        if isinstance(path, str):
+            keys = tuple(path.split('.'))
+        else:
+            keys = tuple(path)
+        if not keys in self.paths:
+            self.paths[keys] = KeyPath(keys)
+        return self.paths[keys]
+    
+    def get(self, path, default=None):
+        return self.get_path(path).get(self.json, default)
+    
+    def get_section(self):
+        if self.section is None:
+            self.section = Section(self.json)
+        return self.section
+    
+    def run(self):
+        self.compile()
+        self.coerce()
+        return self
+
+
+MIN_VERSION = KeyPath('config.min_version')
@@ -1,25 +1,547 @@
 #!/usr/bin/python3
 # -*- coding: UTF-8 -*-
 
+import os
 import ssl
+import json
+import time
+import shutil
+import zlib
+import codecs
+import re
+import hashlib
+import threading
+import contextlib
+import collections
+import email.utils
+import concurrent.futures
+import http.client
+import urllib.error
+import urllib.parse
 import urllib.request
 
 from skl_shared_qt.localize import _
 from skl_shared_qt.message.controller import Message, rep
 from skl_shared_qt.time import Timer
 
+# Changing UA allows us to avoid a bot protection ('Error 403: Forbidden')
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36'}
+MAX_REDIRECTS = 5
+# Errors meaning that the server has closed a kept-alive connection
+STALE = (http.client.RemoteDisconnected, http.client.CannotSendRequest
+        ,ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+CONTEXTS = {}
+# How many bytes to search for <meta charset>
+SNIFF_SIZE = 4096
+CHARSET = re.compile(rb'charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+META = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16')
+       ,(codecs.BOM_UTF16_BE, 'utf-16')
+       )
 
-class Get:
+
+def get_context(Verify=False):
+    ''' On *some* systems we can get urllib.error.URLError: 
+        <urlopen error [SSL: CERTIFICATE_VERIFY_FAILED].
+        To get rid of this error, we use an unverified context, but only for
+        our own connections rather than patching 'ssl' globally.
+    '''
+    try:
+        return CONTEXTS[Verify]
+    except KeyError:
+        pass
+    if Verify:
+        CONTEXTS[Verify] = ssl.create_default_context()
+    else:
+        CONTEXTS[Verify] = ssl._create_unverified_context()
+    return CONTEXTS[Verify]
+
+
+
+def check_charset(charset):
+    # Return a Python codec name or ''
+    if isinstance(charset, bytes):
+        charset = charset.decode('ascii', 'ignore')
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return ''
+
+
+def get_charset(headers=None, data=b'', default='UTF-8'):
+    ''' Detect the encoding of a page by (in this order) a BOM, the
+        Content-Type header and <meta charset> or <meta http-equiv> in the
+        first SNIFF_SIZE bytes of 'data'.
+    '''
+    for bom, charset in BOMS:
+        if data.startswith(bom):
+            return charset
+    if headers:
+        match = CHARSET.search(headers.get('Content-Type', '').encode('latin-1', 'ignore'))
+        if match:
+            charset = check_charset(match.group(1))
+            if charset:
+                return charset
+    match = META.search(data[:SNIFF_SIZE])
+    if match:
+        charset = check_charset(match.group(1))
+        if charset:
+            return charset
+    return default
+
+
+
+class Pool:
+    ''' Keep HTTP/1.1 connections alive and reuse them for the same host.
+        Connections are not shared between threads while in use. Requests
+        through a proxy set in the environment are passed to 'urllib'.
+    '''
+    def __init__(self, maxsize=8):
+        # The max number of idle connections per host
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        # {(scheme, host, port, Verify): [connection, ...]}
+        self.idle = {}
+        self.proxies = urllib.request.getproxies()
+    
+    def _connect(self, key, timeout):
+        scheme, host, port, Verify = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection (host = host
+                                               ,port = port
+                                               ,timeout = timeout
+                                               ,context = get_context(Verify)
+                                               )
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+    
+    def acquire(self, key, timeout):
+        # Return a connection and whether it has been used before
+        with self.lock:
+            conns = self.idle.get(key)
+            if conns:
+                conn = conns.pop()
+                conn.timeout = timeout
+                if conn.sock:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        return self._connect(key, timeout), False
+    
+    def release(self, key, conn, response):
+        # Only fully read responses allow to reuse the connection
+        if response.will_close or not response.isclosed():
+            conn.close()
+            return
+        with self.lock:
+            conns = self.idle.setdefault(key, [])
+            if len(conns) < self.maxsize:
+                conns.append(conn)
+                return
+        conn.close()
+    
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+    
+    def get_key(self, parts, Verify):
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(_('Wrong input data: {}!').format(parts.scheme))
+        port = parts.port
+        if not port:
+            if parts.scheme == 'https':
+                port = 443
+            else:
+                port = 80
+        return (parts.scheme, parts.hostname, port, Verify)
+    
+    def get_path(self, parts):
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        return path
+    
+    def _request(self, key, path, headers, timeout):
+        conn, Reused = self.acquire(key, timeout)
+        try:
+            conn.request('GET', path, headers=headers)
+            return conn, conn.getresponse()
+        except STALE:
+            conn.close()
+            if not Reused:
+                raise
+        # The server has closed an idle connection, try a new one once
+        conn = self._connect(key, timeout)
+        try:
+            conn.request('GET', path, headers=headers)
+            return conn, conn.getresponse()
+        except:
+            conn.close()
+            raise
+    
+    def open(self, url, headers=HEADERS, timeout=6, Verify=False):
+        ''' Return (key, connection, response) following redirects. The
+            response must be read and passed to 'release'.
+        '''
+        for i in range(MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            key = self.get_key(parts, Verify)
+            conn, response = self._request (key = key
+                                           ,path = self.get_path(parts)
+                                           ,headers = headers
+                                           ,timeout = timeout
+                                           )
+            location = response.getheader('Location')
+            if response.status in (301, 302, 303, 307, 308) and location:
+                response.read()
+                self.release(key, conn, response)
+                url = urllib.parse.urljoin(url, location)
+                continue
+            if response.status >= 400:
+                response.read()
+                self.release(key, conn, response)
+                raise urllib.error.HTTPError (url, response.status
+                                             ,response.reason
+                                             ,response.headers, None
+                                             )
+            return key, conn, response
+        raise urllib.error.URLError(_('Too many redirects!'))
+    
+    def _request_proxy(self, url, headers, timeout, Verify):
+        handler = urllib.request.HTTPSHandler(context=get_context(Verify))
+        opener = urllib.request.build_opener(handler)
+        req = urllib.request.Request(url=url, data=None, headers=headers)
+        try:
+            with opener.open(req, timeout=timeout) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as e:
+            # 'urllib' treats "304 Not Modified" as an error
+            if e.code == 304:
+                return e.code, e.headers, b''
+            raise
+    
+    def request(self, url, headers=HEADERS, timeout=6, Verify=False):
+        ''' Return (status, headers, body), raise an exception upon
+            failures.
+        '''
+        scheme = urllib.parse.urlsplit(url).scheme
+        if scheme in self.proxies:
+            return self._request_proxy(url, headers, timeout, Verify)
+        key, conn, response = self.open(url, headers, timeout, Verify)
+        try:
+            body = response.read()
+        except:
+            conn.close()
+            raise
+        self.release(key, conn, response)
+        return response.status, response.headers, body
+    
+    def fetch(self, url, headers=HEADERS, timeout=6, Verify=False):
+        # Return the response body, raise an exception upon failures
+        return self.request(url, headers, timeout, Verify)[2]
+    
+    @contextlib.contextmanager
+    def open_stream(self, url, headers=HEADERS, timeout=6, Verify=False):
+        ''' Yield a response to be read in chunks. The connection is reused
+            only if the response has been read to the end.
+        '''
+        scheme = urllib.parse.urlsplit(url).scheme
+        if scheme in self.proxies:
+            handler = urllib.request.HTTPSHandler(context=get_context(Verify))
+            opener = urllib.request.build_opener(handler)
+            req = urllib.request.Request(url=url, data=None, headers=headers)
+            with opener.open(req, timeout=timeout) as response:
+                yield response
+            return
+        key, conn, response = self.open(url, headers, timeout, Verify)
+        try:
+            yield response
+        except:
+            conn.close()
+            raise
+        self.release(key, conn, response)
+
+
+
+class Entry:
+    
+    __slots__ = ('url', 'time', 'max_age', 'etag', 'modified', 'headers'
+                ,'body')
+    
+    def __init__(self, url, headers, body, time_=None, max_age=0):
+        self.url = url
+        if time_ is None:
+            self.time = time.time()
+        else:
+            self.time = time_
+        self.max_age = max_age
+        # {name: value}, only headers that are needed later are kept
+        self.headers = headers
+        self.set_validators()
+        self.body = body
+    
+    def set_validators(self):
+        self.etag = self.headers.get('ETag', '')
+        self.modified = self.headers.get('Last-Modified', '')
     
-    def __init__(self, url, coding='UTF-8', Verbose=True, Verify=False
+    def is_fresh(self):
+        return time.time() - self.time < self.max_age
+    
+    def get_meta(self):
+        return {'url': self.url, 'time': self.time, 'max_age': self.max_age
+               ,'headers': self.headers
+               }
+    
+    def dump(self):
+        meta = json.dumps(self.get_meta(), ensure_ascii=False)
+        return meta.encode('UTF-8') + b'\n' + self.body
+    
+    @classmethod
+    def load(cls, data):
+        meta, body = data.split(b'\n', 1)
+        meta = json.loads(meta)
+        return cls (url = meta['url']
+                   ,headers = meta['headers']
+                   ,body = body
+                   ,time_ = meta['time']
+                   ,max_age = meta['max_age']
+                   )
+
+
+
+class Cache:
+    ''' An HTTP cache for 'Get' and 'GetMany', see 'use_cache'. Recent
+        entries are kept in memory, all entries are kept on disk until the
+        folder exceeds 'max_size' bytes. Fresh entries (Cache-Control:
+        max-age, Expires) are returned without a request; stale ones are
+        revalidated with If-None-Match/If-Modified-Since, so "304 Not
+        Modified" costs no body transfer. 'no-store' responses are not
+        cached. The Vary header is not supported.
+    '''
+    # Headers needed for revalidation and decoding
+    KEEP = ('ETag', 'Last-Modified', 'Content-Type')
+    
+    def __init__(self, folder, max_size=104857600, max_memory=128):
+        self.folder = folder
+        self.max_size = max_size
+        self.max_memory = max_memory
+        self.lock = threading.Lock()
+        self.memory = collections.OrderedDict()
+        # Calculated upon the first write
+        self.size = None
+    
+    def get_key(self, url, headers):
+        items = [url] + [f'{key}:{headers[key]}' for key in sorted(headers)]
+        return hashlib.sha1('\n'.join(items).encode('UTF-8')).hexdigest()
+    
+    def get_file(self, key):
+        # Subfolders keep folders small
+        return os.path.join(self.folder, key[:2], key)
+    
+    def get_max_age(self, headers):
+        # Return None if the response must not be stored
+        control = headers.get('Cache-Control', '').lower()
+        directives = {}
+        for item in control.split(','):
+            name, _sep, value = item.strip().partition('=')
+            directives[name] = value.strip('"')
+        # This is a private cache, so 'private' responses can be stored
+        if 'no-store' in directives:
+            return
+        if 'no-cache' in directives:
+            return 0
+        try:
+            return int(directives['max-age'])
+        except (KeyError, ValueError):
+            pass
+        expires = headers.get('Expires')
+        if not expires:
+            return 0
+        try:
+            expires = email.utils.parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            return 0
+        return max(0, int(expires - time.time()))
+    
+    def _remember(self, key, entry):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory:
+            self.memory.popitem(last=False)
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry:
+                self.memory.move_to_end(key)
+                return entry
+        file = self.get_file(key)
+        try:
+            with open(file, 'rb') as fl:
+                entry = Entry.load(fl.read())
+        except (OSError, ValueError, KeyError):
+            return
+        self.touch(key)
+        with self.lock:
+            self._remember(key, entry)
+        return entry
+    
+    def get_size(self):
+        size = 0
+        for root, dirs, files in os.walk(self.folder):
+            for file in files:
+                try:
+                    size += os.path.getsize(os.path.join(root, file))
+                except OSError:
+                    pass
+        return size
+    
+    def evict(self):
+        # Delete the oldest files until the cache takes 90% of 'max_size'
+        f = '[SharedQt] get_url.Cache.evict'
+        files = []
+        for root, dirs, files_ in os.walk(self.folder):
+            for file in files_:
+                file = os.path.join(root, file)
+                try:
+                    stat = os.stat(file)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, file))
+        files.sort()
+        size = sum([item[1] for item in files])
+        count = 0
+        for mtime, fsize, file in files:
+            if size <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(file)
+            except OSError:
+                continue
+            size -= fsize
+            count += 1
+        self.size = size
+        Message(f, _('{} files have been deleted'), args=(count,)).show_debug()
+    
+    def put(self, key, entry):
+        f = '[SharedQt] get_url.Cache.put'
+        with self.lock:
+            self._remember(key, entry)
+        file = self.get_file(key)
+        data = entry.dump()
+        try:
+            os.makedirs(os.path.dirname(file), exist_ok=True)
+            # Other threads and processes must not read a partial entry
+            tmp = f'{file}.{threading.get_ident()}.tmp'
+            with open(tmp, 'wb') as fl:
+                fl.write(data)
+            os.replace(tmp, file)
+        except OSError as e:
+            mes = _('Unable to write file "{}"! ({})').format(file, e)
+            Message(f, mes).show_warning()
+            return
+        with self.lock:
+            if self.size is None:
+                self.size = self.get_size()
+            else:
+                self.size += len(data)
+            Evict = self.max_size and self.size > self.max_size
+        if Evict:
+            self.evict()
+    
+    def touch(self, key):
+        # Recently used entries are evicted last
+        try:
+            os.utime(self.get_file(key))
+        except OSError:
+            pass
+    
+    def request(self, url, headers=HEADERS, timeout=6, Verify=False):
+        # The same as 'Pool.request', but cached responses are used
+        f = '[SharedQt] get_url.Cache.request'
+        key = self.get_key(url, headers)
+        entry = self.get(key)
+        if entry and entry.is_fresh():
+            Message(f, _('Use cache for "{}"'), args=(url,)).show_debug()
+            return 200, entry.headers, entry.body
+        conditions = dict(headers)
+        if entry and entry.etag:
+            conditions['If-None-Match'] = entry.etag
+        if entry and entry.modified:
+            conditions['If-Modified-Since'] = entry.modified
+        status, rheaders, body = POOL.request(url, conditions, timeout, Verify)
+        max_age = self.get_max_age(rheaders)
+        if status == 304 and entry:
+            mes = _('"{}" has not been modified')
+            Message(f, mes, args=(url,)).show_debug()
+            entry.time = time.time()
+            if max_age is not None:
+                entry.max_age = max_age
+            # Headers of 304 can update validators
+            for name in ('ETag', 'Last-Modified'):
+                if rheaders.get(name):
+                    entry.headers[name] = rheaders[name]
+            entry.set_validators()
+            self.put(key, entry)
+            return 200, entry.headers, entry.body
+        if max_age is not None and status == 200:
+            kept = {name: rheaders[name] for name in self.KEEP \
+                    if rheaders.get(name)}
+            # Entries without validators and max-age are useless
+            if max_age or kept.get('ETag') or kept.get('Last-Modified'):
+                self.put(key, Entry(url, kept, body, max_age=max_age))
+        return status, rheaders, body
+    
+    def fetch(self, url, headers=HEADERS, timeout=6, Verify=False):
+        return self.request(url, headers, timeout, Verify)[2]
+    
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.size = 0
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+
+def use_cache(folder='', app_name='skl_shared_qt', max_size=104857600
+             ,max_memory=128):
+    ''' Cache responses of 'Get' and 'GetMany' in 'folder' (by default, in
+        the share folder of 'app_name'). Call 'use_cache(max_size=0)' for no
+        size limit and 'use_cache(None)' to stop caching.
+    '''
+    global CACHE
+    if folder is None:
+        CACHE = None
+        return
+    if not folder:
+        from skl_shared_qt.paths import Home
+        folder = Home(app_name).add_share('http_cache')
+    CACHE = Cache(folder, max_size, max_memory)
+    return CACHE
+
+
+def get_client():
+    if CACHE is None:
+        return POOL
+    return CACHE
+
+
+
+class Get:
+    ''' By default, the encoding is detected by the Content-Type header and
+        <meta charset> (UTF-8 if none is given), see 'get_charset'. Set
+        'coding' to a codec name to force it.
+    '''
+    def __init__(self, url, coding='auto', Verbose=True, Verify=False
                 ,timeout=6):
         self.html = ''
+        self.headers = {}
         self.timeout = timeout
         self.url = url
         self.coding = coding
         self.Verbose = Verbose
         self.Verify = Verify
-        self.use_unverified()
     
     def read(self):
         ''' This is a dummy function to return the final result. It is needed
@@ -27,29 +549,13 @@ class Get:
         '''
         return self.html
     
-    def use_unverified(self):
-        ''' On *some* systems we can get urllib.error.URLError: 
-            <urlopen error [SSL: CERTIFICATE_VERIFY_FAILED].
-            To get rid of this error, we use this small workaround.
-        '''
-        f = '[SharedQt] get_url.Get.unverified'
-        if self.Verify:
-            return
-        if not hasattr(ssl, '_create_unverified_context'):
-            mes = _('Unable to use unverified certificates!')
-            Message(f, mes).show_warning()
-            return
-        ssl._create_default_https_context = ssl._create_unverified_context
-        
     def _get(self):
-        ''' Changing UA allows us to avoid a bot protection
-            ('Error 403: Forbidden').
-        '''
         f = '[SharedQt] get_url.Get._get'
         try:
-            req = urllib.request.Request(url = self.url, data = None
-                                        ,headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36'})
-            self.html = urllib.request.urlopen(req, timeout=self.timeout).read()
+            status, self.headers, self.html = get_client().request (url = self.url
+                                                                   ,timeout = self.timeout
+                                                                   ,Verify = self.Verify
+                                                                   )
             if self.Verbose:
                 mes = _('[OK]: "{}"').format(self.url)
                 Message(f, mes).show_info()
@@ -68,11 +574,18 @@ class Get:
         if not self.html:
             rep.empty(f)
             return
+        if self.coding == 'auto':
+            coding = get_charset(self.headers, self.html)
+        else:
+            coding = self.coding
         try:
-            self.html = self.html.decode(encoding=self.coding)
-        except UnicodeDecodeError:
-            self.html = str(self.html)
-            mes = _('Unable to decode "{}"!').format(self.url)
+            self.html = self.html.decode(encoding=coding)
+        except (UnicodeDecodeError, LookupError) as e:
+            # Broken symbols are replaced, the rest of the page is kept
+            self.html = self.html.decode(encoding=check_charset(coding) \
+                                         or 'UTF-8', errors='replace')
+            mes = _('Unable to decode "{}"!\n\nDetails: {}')
+            mes = mes.format(self.url, e)
             Message(f, mes).show_warning()
     
     def run(self):
@@ -93,3 +606,303 @@ class Get:
         if self.Verbose:
             timer.end()
         return self.html
+
+
+
+class Stream:
+    ''' Download a URL in chunks without loading it into memory, e.g.:
+        Stream(url, file='/tmp/dict.zip', Progress=True).run()
+        Stream(url, coding='auto', callback=parse_chunk).run()
+        for chunk in Stream(url, coding='UTF-8').iterate():
+            ...
+        gzip and deflate responses are decompressed on the fly. If 'coding'
+        is set, chunks are decoded incrementally, so multibyte symbols split
+        between chunks are decoded correctly; text is saved to 'file' in
+        UTF-8. 'auto' detects the encoding like 'Get' does by the first
+        chunk. 'progress' is called with the number of bytes received and the
+        total number (0 if unknown); 'Progress' shows 'graphics.progress_bar'
+        (in the GUI thread only).
+    '''
+    def __init__(self, url, file='', callback=None, coding=None, Verbose=True
+                ,Verify=False, timeout=6, chunk_size=65536, progress=None
+                ,Progress=False):
+        self.Success = True
+        self.url = url
+        self.file = file
+        self.callback = callback
+        self.coding = coding
+        self.Verbose = Verbose
+        self.Verify = Verify
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.Progress = Progress
+        self.received = 0
+        self.total = 0
+    
+    def get_decompressor(self, encoding):
+        f = '[SharedQt] get_url.Stream.get_decompressor'
+        encoding = encoding.lower().strip()
+        if encoding in ('gzip', 'x-gzip'):
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if encoding == 'deflate':
+            return Deflate()
+        if encoding and encoding != 'identity':
+            mes = _('Unsupported encoding: "{}"!').format(encoding)
+            Message(f, mes).show_warning()
+    
+    def get_decoder(self, headers, chunk):
+        if self.coding == 'auto':
+            coding = get_charset(headers, chunk)
+        else:
+            coding = check_charset(self.coding) or 'UTF-8'
+        return codecs.getincrementaldecoder(coding)('replace')
+    
+    def report(self):
+        if self.progress:
+            self.progress(self.received, self.total)
+        if not self.Progress:
+            return
+        from skl_shared_qt.graphics.progress_bar.controller import PROGRESS
+        if self.total:
+            PROGRESS.set_value(self.received * 100 // self.total)
+        PROGRESS.set_info(_('{} KiB').format(self.received // 1024))
+        PROGRESS.update()
+    
+    def start_progress(self):
+        if not self.Progress:
+            return
+        from skl_shared_qt.graphics.progress_bar.controller import PROGRESS
+        PROGRESS.set_title(self.url)
+        PROGRESS.set_max(100)
+        PROGRESS.set_value(0)
+        PROGRESS.show()
+    
+    def end_progress(self):
+        if not self.Progress:
+            return
+        from skl_shared_qt.graphics.progress_bar.controller import PROGRESS
+        PROGRESS.close()
+    
+    def iterate(self):
+        # Yield bytes or, if 'coding' is set, text; raise upon failures
+        headers = dict(HEADERS)
+        headers['Accept-Encoding'] = 'gzip, deflate'
+        with POOL.open_stream(self.url, headers, self.timeout, self.Verify) as response:
+            self.total = int(response.headers.get('Content-Length') or 0)
+            decompressor = self.get_decompressor(response.headers.get('Content-Encoding', ''))
+            decoder = None
+            # Undecoded bytes kept until there is enough to detect the encoding
+            pending = b''
+            while True:
+                chunk = response.read(self.chunk_size)
+                if not chunk:
+                    break
+                self.received += len(chunk)
+                self.report()
+                if decompressor:
+                    chunk = decompressor.decompress(chunk)
+                if self.coding and not decoder:
+                    pending += chunk
+                    if self.coding == 'auto' and len(pending) < SNIFF_SIZE:
+                        continue
+                    decoder = self.get_decoder(response.headers, pending)
+                    chunk, pending = pending, b''
+                if decoder:
+                    chunk = decoder.decode(chunk)
+                if chunk:
+                    yield chunk
+            tail = b''
+            if decompressor:
+                tail = decompressor.flush()
+            if self.coding and not decoder:
+                tail = pending + tail
+                decoder = self.get_decoder(response.headers, tail)
+            if decoder:
+                tail = decoder.decode(tail, True)
+            if tail:
+                yield tail
+    
+    def _write(self):
+        # Write to a temporary file first, so a failure does not leave a part
+        tmp = self.file + '.part'
+        if self.coding:
+            fl = open(tmp, 'w', encoding='UTF-8')
+        else:
+            fl = open(tmp, 'wb')
+        try:
+            with fl:
+                for chunk in self.iterate():
+                    fl.write(chunk)
+                    if self.callback:
+                        self.callback(chunk)
+        except:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        os.replace(tmp, self.file)
+    
+    def run(self):
+        f = '[SharedQt] get_url.Stream.run'
+        if not self.url or not isinstance(self.url, str):
+            self.Success = False
+            mes = _('Wrong input data: {}!').format(self.url)
+            Message(f, mes, True).show_warning()
+            return
+        if self.Verbose:
+            timer = Timer(f)
+            timer.start()
+        self.start_progress()
+        try:
+            if self.file:
+                self._write()
+            else:
+                for chunk in self.iterate():
+                    if self.callback:
+                        self.callback(chunk)
+            if self.Verbose:
+                mes = _('[OK]: "{}"').format(self.url)
+                Message(f, mes).show_info()
+        # Too many possible exceptions
+        except Exception as e:
+            self.Success = False
+            mes = _('[FAILED]: "{}". Details: {}').format(self.url, e)
+            Message(f, mes).show_warning()
+        finally:
+            self.end_progress()
+        if self.Verbose:
+            timer.end()
+        return self.Success
+
+
+
+class Deflate:
+    ''' Servers send "deflate" either as zlib data (as required) or as raw
+        deflate data. Detect it from the first chunk.
+    '''
+    def __init__(self):
+        self.obj = None
+    
+    def decompress(self, chunk):
+        if self.obj is None:
+            self.obj = zlib.decompressobj()
+            try:
+                return self.obj.decompress(chunk)
+            except zlib.error:
+                self.obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self.obj.decompress(chunk)
+    
+    def flush(self):
+        if self.obj is None:
+            return b''
+        return self.obj.flush()
+
+
+
+class GetMany:
+    ''' Fetch many URLs concurrently, e.g.:
+        for url, html in GetMany(urls).iterate():
+            ...
+        Results are yielded as soon as they are ready; 'run' returns them in
+        the order of 'urls'. Failed pages are returned as ''. Connection
+        errors, timeouts, 429 and 5xx responses are retried after 'backoff',
+        2*'backoff', 4*'backoff' ... seconds.
+    '''
+    def __init__(self, urls, coding='auto', Verbose=True, Verify=False
+                ,timeout=6, workers=16, per_host=4, retries=2, backoff=0.5):
+        self.urls = list(urls)
+        self.coding = coding
+        self.Verbose = Verbose
+        self.Verify = Verify
+        self.timeout = timeout
+        self.workers = workers
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        # {host: threading.Semaphore}
+        self.hosts = {}
+    
+    def get_semaphore(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = threading.Semaphore(self.per_host)
+            return self.hosts[host]
+    
+    def is_retriable(self, e):
+        if isinstance(e, urllib.error.HTTPError):
+            return e.code == 429 or e.code >= 500
+        return isinstance(e, (OSError, http.client.HTTPException))
+    
+    def _fetch(self, url):
+        # Return (status, headers, body), raise an exception upon failures
+        semaphore = self.get_semaphore(url)
+        attempt = 0
+        while True:
+            try:
+                with semaphore:
+                    return get_client().request (url = url
+                                                ,timeout = self.timeout
+                                                ,Verify = self.Verify
+                                                )
+            except Exception as e:
+                if attempt >= self.retries or not self.is_retriable(e):
+                    raise
+            # Do not hold the host slot while waiting
+            time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+    
+    def fetch(self, url):
+        f = '[SharedQt] get_url.GetMany.fetch'
+        iget = Get(url, self.coding, self.Verbose, self.Verify, self.timeout)
+        if not url or not isinstance(url, str):
+            mes = _('Wrong input data: {}!').format(url)
+            Message(f, mes).show_warning()
+            return url, ''
+        try:
+            status, iget.headers, iget.html = self._fetch(url)
+            if self.Verbose:
+                Message(f, _('[OK]: "{}"'), args=(url,)).show_info()
+        # Too many possible exceptions
+        except Exception as e:
+            mes = _('[FAILED]: "{}". Details: {}').format(url, e)
+            Message(f, mes).show_warning()
+            return url, ''
+        iget.decode()
+        return url, iget.html
+    
+    def iterate(self):
+        # Yield (url, html) as soon as pages are fetched
+        f = '[SharedQt] get_url.GetMany.iterate'
+        if not self.urls:
+            rep.empty(f)
+            return
+        workers = max(1, min(self.workers, len(self.urls)))
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            futures = [executor.submit(self.fetch, url) for url in self.urls]
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    yield future.result()
+            finally:
+                # The caller may stop iterating early
+                for future in futures:
+                    future.cancel()
+    
+    def run(self):
+        f = '[SharedQt] get_url.GetMany.run'
+        if self.Verbose:
+            timer = Timer(f)
+            timer.start()
+        results = dict(self.iterate())
+        if self.Verbose:
+            timer.end()
+        return [results.get(url, '') for url in self.urls]
+
+
+# Connections are reused by all 'Get' instances
+POOL = Pool()
+# See 'use_cache'
+CACHE = None
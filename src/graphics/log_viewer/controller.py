@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+from skl_shared_qt.localize import _
+import skl_shared_qt.message.controller as ms
+from skl_shared_qt.graphics.log_viewer.gui import LogViewer as guiLogViewer
+
+
+class LogViewer:
+    ''' Show recent messages kept in 'message.controller.RING' and update
+        them while the window is open.
+    '''
+    def __init__(self, interval=500):
+        self.interval = interval
+        self.total = -1
+        self.levels = (0, ms.DEBUG, ms.INFO, ms.WARNING, ms.ERROR)
+        self.set_gui()
+    
+    def set_gui(self):
+        self.gui = guiLogViewer()
+        self.gui.set_title(_('Messages'))
+        self.gui.set_levels ((_('All'), _('DEBUG'), _('INFO'), _('WARNING')
+                             ,_('ERROR')
+                            ))
+        self.set_bindings()
+    
+    def set_bindings(self):
+        self.gui.bind(('Escape',), self.close)
+        self.gui.bind_filter(self.set_filter)
+        self.gui.bind_timer(self.reload)
+    
+    def set_filter(self, *args):
+        level = self.levels[max(self.gui.get_level_index(), 0)]
+        self.gui.set_filter(level, self.gui.get_func())
+    
+    def reload(self):
+        # Do nothing if there are no new messages
+        if ms.RING is None or ms.RING.total == self.total:
+            return
+        records, total = ms.RING.get_since(self.total)
+        if total - len(records) == self.total:
+            self.gui.add(records, ms.RING.size)
+        else:
+            # Some records have been overwritten or the buffer has been cleared
+            self.gui.fill(records, total)
+        self.total = total
+    
+    def show(self):
+        self.reload()
+        self.gui.start_timer(self.interval)
+        self.gui.show_maximized()
+    
+    def close(self):
+        self.gui.stop_timer()
+        self.gui.close()
+
+
+LOG_VIEWER = LogViewer()
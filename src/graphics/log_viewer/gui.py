@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+
+import time
+import bisect
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from PyQt6.QtWidgets import QWidget, QTableView, QComboBox, QLineEdit \
+                           ,QHBoxLayout, QHeaderView
+from PyQt6.QtGui import QFont
+
+from skl_shared_qt.localize import _
+from skl_shared_qt.graphics.debug.gui import Debug
+
+
+class TableModel(QAbstractTableModel):
+    ''' Only visible rows are requested by the view, so the number of records
+        does not matter. Records are numbered from the start of the ring
+        buffer, 'rows' keeps the numbers of records passing the filter, so new
+        records are filtered and inserted without resetting the model.
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.headers = (_('No.'), _('Time'), _('Type'), _('Thread')
+                       ,_('Procedure'), _('Message'))
+        self.records = []
+        # The number of the first record kept
+        self.start = 0
+        self.rows = []
+        self.level = 0
+        self.func = ''
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return
+        record = self.records[self.rows[index.row()]-self.start]
+        match index.column():
+            case 0:
+                return record.count
+            case 1:
+                return time.strftime('%H:%M:%S', time.localtime(record.time))
+            case 2:
+                return record.type_
+            case 3:
+                return record.thread
+            case 4:
+                return record.func
+            case 5:
+                # Multiline messages would break a row height
+                return record.message.replace('\n', ' ')
+
+    def _filter(self, records, start):
+        func = self.func.lower()
+        return [start + i for i, record in enumerate(records) \
+                if record.level >= self.level \
+                and (not func or func in record.func.lower())]
+
+    def set_filter(self, level=0, func=''):
+        self.beginResetModel()
+        self.level = level
+        self.func = func
+        self.rows = self._filter(self.records, self.start)
+        self.endResetModel()
+
+    def fill(self, records, total):
+        # Start over with 'records' being the last ones of 'total'
+        self.beginResetModel()
+        self.records = records
+        self.start = total - len(records)
+        self.rows = self._filter(self.records, self.start)
+        self.endResetModel()
+
+    def add(self, records, size):
+        # Append new records and drop the ones the ring buffer has overwritten
+        rows = self._filter(records, self.start + len(self.records))
+        self.records += records
+        excess = len(self.records) - size
+        if excess > 0:
+            start = self.start + excess
+            count = bisect.bisect_left(self.rows, start)
+            if count:
+                self.beginRemoveRows(QModelIndex(), 0, count - 1)
+                del self.rows[:count]
+                self.endRemoveRows()
+            self.start = start
+            del self.records[:excess]
+        if rows:
+            count = len(self.rows)
+            self.beginInsertRows(QModelIndex(), count, count + len(rows) - 1)
+            self.rows += rows
+            self.endInsertRows()
+
+
+
+class LogViewer(Debug):
+
+    def set_gui(self):
+        self.set_layout()
+        self.panel = QWidget()
+        self.layout_panel = QHBoxLayout()
+        self.layout_panel.setContentsMargins(0, 0, 0, 0)
+        self.levels = QComboBox()
+        self.entry = QLineEdit()
+        self.entry.setPlaceholderText(_('Procedure'))
+        self.layout_panel.addWidget(self.levels)
+        self.layout_panel.addWidget(self.entry)
+        self.panel.setLayout(self.layout_panel)
+        self.model = TableModel()
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setWordWrap(False)
+        self.view.verticalHeader().hide()
+        # Resizing to contents would require visiting all rows
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.view.horizontalHeader().setStretchLastSection(True)
+        self.font = QFont('Mono', 11)
+        self.view.setFont(self.font)
+        self.layout_.addWidget(self.panel)
+        self.layout_.addWidget(self.view)
+        self.setLayout(self.layout_)
+        self.timer = QTimer(self)
+
+    def set_levels(self, items):
+        self.levels.clear()
+        self.levels.addItems(items)
+
+    def get_level_index(self):
+        return self.levels.currentIndex()
+
+    def get_func(self):
+        return self.entry.text()
+
+    def set_filter(self, level, func):
+        self.model.set_filter(level, func)
+
+    def is_at_end(self):
+        bar = self.view.verticalScrollBar()
+        return bar.value() == bar.maximum()
+
+    def fill(self, records, total):
+        # Keep the view at the end if it is already there
+        AtEnd = self.is_at_end()
+        self.model.fill(records, total)
+        if AtEnd:
+            self.view.scrollToBottom()
+
+    def add(self, records, size):
+        AtEnd = self.is_at_end()
+        self.model.add(records, size)
+        if AtEnd:
+            self.view.scrollToBottom()
+
+    def bind_filter(self, action):
+        self.levels.currentIndexChanged.connect(action)
+        self.entry.textChanged.connect(action)
+
+    def bind_timer(self, action):
+        self.timer.timeout.connect(action)
+
+    def start_timer(self, interval):
+        self.timer.start(interval)
+
+    def stop_timer(self):
+        self.timer.stop()
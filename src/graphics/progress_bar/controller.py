@@ -2,7 +2,7 @@
 # -*- coding: UTF-8 -*-
 
 from skl_shared_qt.localize import _
-from skl_shared_qt.basic_text import Shorten
+from skl_shared_qt.basic_text import shorten
 from skl_shared_qt.graphics.progress_bar.gui import ProgressBar as guiProgressBar
 from skl_shared_qt.logic import Input
 
@@ -16,7 +16,7 @@ class ProgressBar:
         self.gui.set_title(title)
     
     def set_info(self, info):
-        info = Shorten(info, 34).run()
+        info = shorten(info, 34, Display=True)
         self.gui.set_info(info)
     
     def set_value(self, value):
@@ -8,6 +8,47 @@ from skl_shared_qt.message.controller import Message
 from skl_shared_qt.logic import Text
 
 
+class Lookup:
+    ''' Check membership by hash. Unhashable items (e.g., lists) are
+        compared one by one, so mixed lists are supported as well.
+    '''
+    def __init__(self, items=()):
+        self.other = []
+        try:
+            self.hashed = set(items)
+        except TypeError:
+            self.hashed = set()
+            for item in items:
+                self.add(item)
+    
+    def add(self, item):
+        try:
+            self.hashed.add(item)
+        except TypeError:
+            self.other.append(item)
+    
+    def __contains__(self, item):
+        try:
+            return item in self.hashed
+        except TypeError:
+            return item in self.other
+
+
+
+def get_unique(items, keys=None):
+    # Keep the first occurrence of each item (or key), preserve the order
+    if keys is None:
+        keys = items
+    seen = Lookup()
+    result = []
+    for item, key in zip(items, keys):
+        if key not in seen:
+            seen.add(key)
+            result.append(item)
+    return result
+
+
+
 class List:
 
     def __init__(self, lst1=[], lst2=[]):
@@ -96,12 +137,14 @@ class List:
                 return([index_, index_ + len_ - 1])
     
     def get_shared(self):
-        return [item for item in self.lst2 if item in self.lst1]
+        lookup = Lookup(self.lst1)
+        return [item for item in self.lst2 if item in lookup]
     
     def eats(self):
         # Check if 'lst1' fully comprises 'lst2'
+        lookup = Lookup(self.lst1)
         for item in self.lst2:
-            if not item in self.lst1:
+            if not item in lookup:
                 return False
         return True
     
@@ -109,24 +152,13 @@ class List:
         ''' Remove (case-insensitively) duplicate items (positioned after
             original items). Both lists must consist of strings.
         '''
-        cilst = [item.lower() for item in self.lst1]
-        i = len(cilst) - 1
-        while i >= 0:
-            ind = cilst.index(cilst[i])
-            if ind < i:
-                del cilst[i]
-                del self.lst1[i]
-            i -= 1
+        # Change 'lst1' in place, references to it must see the result
+        self.lst1[:] = get_unique(self.lst1, [item.lower() for item in self.lst1])
         return self.lst1
     
     def delete_duplicates(self):
         # Remove duplicate items (positioned after original items)
-        i = len(self.lst1) - 1
-        while i >= 0:
-            ind = self.lst1.index(self.lst1[i])
-            if ind < i:
-                del self.lst1[i]
-            i -= 1
+        self.lst1[:] = get_unique(self.lst1)
         return self.lst1
     
     def space_items(self):
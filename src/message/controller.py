@@ -1,24 +1,177 @@
 #!/usr/bin/python3
 # -*- coding: UTF-8 -*-
 
+import time
+import atexit
+import functools
+import importlib
+import threading
+
 STOP = False
 GRAPHICAL = True
 MAX_LEN = 200
+# Message levels. Questions return answers and are never filtered.
+DEBUG = 10
+INFO = 20
+WARNING = 30
+QUESTION = 35
+ERROR = 40
+''' Messages (including graphical ones) below this level are discarded before
+    any formatting is done.
+'''
+LEVEL = DEBUG
+''' Set this to 'message.sink.AsyncLog(...)' to write console messages in a
+    background thread, see 'use_async'.
+'''
+SINK = None
+CONSOLE_LOCK = threading.RLock()
+# Console questions share a backend, but must not block other messages
+QUESTION_LOCK = threading.Lock()
+''' Message backends are imported on the first use only, so headless apps do
+    not pay for them (GUI parts are imported by backends only if a graphical
+    message is shown).
+'''
+BACKENDS = {DEBUG: ('skl_shared_qt.message.debug.controller', 'Debug')
+           ,INFO: ('skl_shared_qt.message.info.controller', 'Info')
+           ,WARNING: ('skl_shared_qt.message.warning.controller', 'Warning')
+           ,QUESTION: ('skl_shared_qt.message.question.controller', 'Question')
+           ,ERROR: ('skl_shared_qt.message.error.controller', 'Error')
+           }
+LOADED = {}
 
-from skl_shared_qt.message.info.controller import Info
-from skl_shared_qt.message.debug.controller import Debug
-from skl_shared_qt.message.warning.controller import Warning
-from skl_shared_qt.message.error.controller import Error
-from skl_shared_qt.message.question.controller import Question
 from skl_shared_qt.localize import _
-from skl_shared_qt.basic_text import Shorten
+from skl_shared_qt.basic_text import shorten
+from skl_shared_qt.message.sink import Record, RingBuffer, Stats
+
+
+def get_backend(level):
+    try:
+        return LOADED[level]
+    except KeyError:
+        module, name = BACKENDS[level]
+        LOADED[level] = getattr(importlib.import_module(module), name)
+        return LOADED[level]
+
+
+def is_enabled(level):
+    ''' Check this before building expensive messages, e.g.:
+        if ms.is_enabled(ms.DEBUG):
+            Message(f, get_report()).show_debug()
+    '''
+    return not STOP and level >= LEVEL
+
+
+def use_async(*sinks, maxsize=10000, Drop=True):
+    ''' Write console messages asynchronously, e.g.:
+        use_async(ConsoleSink(), FileSink('/tmp/app.log'))
+    '''
+    global SINK
+    from skl_shared_qt.message.sink import AsyncLog
+    if SINK is not None:
+        SINK.stop()
+    SINK = AsyncLog(sinks, maxsize=maxsize, Drop=Drop)
+    return SINK
+
+
+
+def flush_limiter():
+    # Report messages suppressed by 'LIMITER' so far
+    if LIMITER is None:
+        return
+    for func, count, level, type_, cls in LIMITER.flush():
+        Message(func, '').summarize(cls, count, level, type_)
+
+
+
+class Limiter:
+    ''' Collapse repeated (func, level, message) triples within 'window'
+        seconds into "N similar messages" summaries and allow no more than
+        'dialogs' graphical messages per 'window' (the rest are printed to
+        the console only), so a failure loop cannot spawn hundreds of modal
+        boxes.
+    '''
+    def __init__(self, window=2, dialogs=3, maxsize=1000):
+        self.window = window
+        self.dialogs = dialogs
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        # {key: [window start, suppressed, type_, cls]}
+        self.seen = {}
+        # Keys having suppressed messages, usually there are few of them
+        self.pending = set()
+        self.shown = []
+    
+    def _pop(self, key, item, summaries):
+        # Move suppressed messages of 'key' to 'summaries'
+        if item[1]:
+            summaries.append((key[0], item[1], key[1], item[2], item[3]))
+            item[1] = 0
+        self.pending.discard(key)
+    
+    def expire(self, now, summaries):
+        # Report bursts that have stopped without waiting for the same key
+        for key in [key for key in self.pending \
+                    if now - self.seen[key][0] >= self.window]:
+            self._pop(key, self.seen[key], summaries)
+    
+    def prune(self, now, summaries):
+        # Drop expired keys, then the oldest ones if there are still too many
+        for key in [key for key, item in self.seen.items() \
+                    if now - item[0] >= self.window]:
+            self._pop(key, self.seen.pop(key), summaries)
+        if len(self.seen) < self.maxsize:
+            return
+        keys = sorted(self.seen, key=lambda key: self.seen[key][0])
+        for key in keys[:len(keys)-self.maxsize//2]:
+            self._pop(key, self.seen.pop(key), summaries)
+    
+    def check(self, key, type_, cls):
+        ''' Return a tuple (Allow, summaries), where summaries are
+            (func, count, level, type_, cls) of suppressed messages whose
+            window has expired.
+        '''
+        now = time.monotonic()
+        summaries = []
+        with self.lock:
+            self.expire(now, summaries)
+            item = self.seen.get(key)
+            if item is None:
+                if len(self.seen) >= self.maxsize:
+                    self.prune(now, summaries)
+                self.seen[key] = [now, 0, type_, cls]
+                return(True, summaries)
+            if now - item[0] < self.window:
+                item[1] += 1
+                self.pending.add(key)
+                return(False, summaries)
+            item[0] = now
+            return(True, summaries)
+    
+    def allow_dialog(self):
+        now = time.monotonic()
+        with self.lock:
+            self.shown = [shown for shown in self.shown \
+                          if now - shown < self.window]
+            if len(self.shown) >= self.dialogs:
+                return False
+            self.shown.append(now)
+            return True
+    
+    def flush(self):
+        # Return (func, count, level, type_, cls) of suppressed messages
+        result = []
+        with self.lock:
+            for key in list(self.pending):
+                self._pop(key, self.seen[key], result)
+        return result
+
 
 
 class Report:
     
     def failed(self, func='Logic error', output='Logic error', Graphical=True):
-        mes = _('Operation has failed!\n\nDetails: {}').format(output)
-        Message(func, mes, Graphical).show_error()
+        mes = _('Operation has failed!\n\nDetails: {}')
+        Message(func, mes, Graphical, args=(output,)).show_error()
     
     def lazy(self, func=_('Logic error!')):
         Message(func, _('Nothing to do!')).show_debug()
@@ -28,10 +181,9 @@ class Report:
     
     def wrong_input(self, func=_('Logic error!'), data=None):
         if data:
-            mes = _('Wrong input data: "{}"!').format(data)
+            Message(func, _('Wrong input data: "{}"!'), True, args=(data,)).show_warning()
         else:
-            mes = _('Wrong input data!')
-        Message(func, mes, True).show_warning()
+            Message(func, _('Wrong input data!'), True).show_warning()
     
     def empty(self, func=_('Logic error!'), Graphical=False):
         Message(func, _('Empty input is not allowed!'), Graphical).show_warning()
@@ -44,31 +196,31 @@ class Report:
     
     def deleted(self, func=_('Logic error!'), count=0):
         if count:
-            message = _('{} blocks have been deleted').format(count)
-            Message(func, message).show_debug()
+            message = _('{} blocks have been deleted')
+            Message(func, message, args=(count,)).show_debug()
     
     def matches(self, func=_('Logic error!'), count=0):
         if count:
-            message = _('{} matches').format(count)
-            Message(func, message).show_debug()
+            Message(func, _('{} matches'), args=(count,)).show_debug()
     
     def third_party(self, func=_('Logic error!'), message=_('Logic error!')):
-        mes = _('Third-party module has failed!\n\nDetails: {}').format(message)
-        Message(func, mes, True).show_error()
+        mes = _('Third-party module has failed!\n\nDetails: {}')
+        Message(func, mes, True, args=(message,)).show_error()
     
     def condition(self, func=_('Logic error!'), message=_('Logic error!')):
-        message = _('The condition "{}" is not observed!').format(message)
-        Message(func, message, True).show_warning()
+        mes = _('The condition "{}" is not observed!')
+        Message(func, mes, True, args=(message,)).show_warning()
 
 
 
 class Format:
-    
+    # Messages can come from different threads, so the counter is locked
     def __init__(self):
         self.count = 0
         self.type_ = _('INFO')
         self.func = _('Unknown procedure')
         self.message = ''
+        self.lock = threading.Lock()
     
     def reset(self, func, message, type_):
         self.func = func
@@ -76,7 +228,9 @@ class Format:
         self.type_ = type_
     
     def increment(self):
-        self.count += 1
+        with self.lock:
+            self.count += 1
+            return self.count
     
     def get(self):
         return f'{self.count}:{self.func}:{self.type_}:{self.message}'
@@ -84,26 +238,47 @@ class Format:
     def run(self):
         self.increment()
         return self.get()
+    
+    def format(self, func, message, type_):
+        # A thread-safe version of 'reset' + 'run'
+        count = self.increment()
+        return f'{count}:{func}:{type_}:{message}'
 
 
 
 class Message:
-    # To quit an app correctly, the last GUI message must be non-blocking
-    def __init__(self, func, message, Graphical=False, Block=False, limit=200):
-        self.type_ = _('INFO')
-        self.func = str(func)
-        self.message = str(message)
-        self.Graphical = GRAPHICAL and Graphical
+    ''' To quit an app correctly, the last GUI message must be non-blocking.
+        Nothing is formatted until the message passes the level filter:
+        'message' can be a callable returning the text, and 'args' are
+        passed to 'message.format' only if the message is shown, e.g.:
+        Message(f, _('New value: "{}"'), args=(key,)).show_debug()
+    '''
+    def __init__(self, func, message, Graphical=False, Block=False, limit=200
+                ,args=()):
+        self.type_ = ''
+        self.level = INFO
+        self.func = func
+        self.message = message
+        self.Graphical = Graphical
         self.Block = Block
         self.limit = limit
+        self.args = args
+    
+    def resolve(self):
+        self.func = str(self.func)
+        if callable(self.message):
+            self.message = self.message()
+        self.message = str(self.message)
+        if self.args:
+            self.message = self.message.format(*self.args)
+        self.Graphical = GRAPHICAL and self.Graphical
         self.shorten()
 
     def shorten(self):
-        self.message = Shorten(self.message, MAX_LEN, ShowGap=True).run()
+        self.message = shorten(self.message, MAX_LEN, ShowGap=True)
     
     def get_silent(self):
-        FORMAT.reset(self.func, self.message, self.type_)
-        return FORMAT.run()
+        return FORMAT.format(self.func, self.message, self.type_)
     
     def get_message(self):
         if not self.Graphical:
@@ -111,55 +286,134 @@ class Message:
         sub = _('Code block: {}').format(self.func)
         return f'{self.message}\n\n{sub}'
     
-    def duplicate(self, inst):
-        # Duplicate the message to the console, if necessary
+    def get_record(self):
+        return Record (count = FORMAT.increment()
+                      ,level = self.level
+                      ,type_ = self.type_
+                      ,func = self.func
+                      ,message = self.message
+                      )
+    
+    def log(self, cls):
+        # Print the message or pass it to the asynchronous sink
+        record = self.get_record()
+        if RING is not None:
+            RING.append(record)
+        if SINK is None:
+            # Console backends are singletons, do not mix messages up
+            with CONSOLE_LOCK:
+                cls(record.get_line()).show()
+            return
+        SINK.put(record)
+    
+    def summarize(self, cls, count, level, type_):
+        self.message = _('{} similar messages have been suppressed')
+        self.args = (count,)
+        self.Graphical = False
+        self.resolve()
+        self.level = level
+        self.type_ = type_
+        self.log(cls)
+    
+    def check_limit(self, cls):
+        ''' Blocking messages pause the app, so, like questions, they are
+            neither suppressed nor counted against the dialog quota.
+        '''
+        if LIMITER is None or self.Block:
+            return True
+        Allow, summaries = LIMITER.check((self.func, self.level, self.message)
+                                         ,self.type_, cls)
+        for func, count, level, type_, cls_ in summaries:
+            Message(func, '').summarize(cls_, count, level, type_)
+        if not Allow:
+            return
+        if self.Graphical and not LIMITER.allow_dialog():
+            self.Graphical = False
+        return True
+    
+    def dispatch(self, cls):
+        # Count suppressed messages as well
+        STATS.add(self.func, self.level)
+        if not self.check_limit(cls):
+            return
+        # Graphical messages are duplicated to the console
         if self.Graphical:
-            inst.message = self.get_silent()
-            inst.Graphical = False
-            inst.show()
+            # Widgets can be used in the GUI thread only
+            from skl_shared_qt.message.gui import get_dispatcher
+            get_dispatcher().show(cls, self.get_message(), self.Block)
+        self.log(cls)
     
     def show_debug(self):
-        if STOP:
+        if STOP or LEVEL > DEBUG:
             return
+        self.resolve()
+        self.level = DEBUG
         self.type_ = _('DEBUG')
-        idebug = Debug(self.get_message(), self.Graphical, self.Block)
-        idebug.show()
-        self.duplicate(idebug)
+        self.dispatch(get_backend(DEBUG))
     
     def show_error(self):
-        if STOP:
+        if STOP or LEVEL > ERROR:
             return
+        self.resolve()
+        self.level = ERROR
         self.type_ = _('ERROR')
-        ierror = Error(self.get_message(), self.Graphical, self.Block)
-        ierror.show()
-        self.duplicate(ierror)
+        self.dispatch(get_backend(ERROR))
 
     def show_info(self):
-        if STOP:
+        if STOP or LEVEL > INFO:
             return
+        self.resolve()
+        self.level = INFO
         self.type_ = _('INFO')
-        iinfo = Info(self.get_message(), self.Graphical, self.Block)
-        iinfo.show()
-        self.duplicate(iinfo)
+        self.dispatch(get_backend(INFO))
                        
     def show_warning(self):
-        if STOP:
+        if STOP or LEVEL > WARNING:
             return
+        self.resolve()
+        self.level = WARNING
         self.type_ = _('WARNING')
-        iwarn = Warning(self.get_message(), self.Graphical, self.Block)
-        iwarn.show()
-        self.duplicate(iwarn)
+        self.dispatch(get_backend(WARNING))
 
+    def ask(self, ForAll=False):
+        self.resolve()
+        self.level = QUESTION
+        self.type_ = _('QUESTION')
+        STATS.add(self.func, self.level)
+        cls = get_backend(QUESTION)
+        if ForAll:
+            cls = functools.partial(cls, ForAll=True)
+        if not self.Graphical:
+            # The backend takes 'CONSOLE_LOCK' only to print the prompt
+            with QUESTION_LOCK:
+                return cls(self.get_message(), False, self.Block).show()
+        from skl_shared_qt.message.gui import get_dispatcher
+        #TODO: Duplicate
+        return get_dispatcher().ask(cls, self.get_message(), self.Block)
+    
     def show_question(self):
         if STOP:
             return
-        self.type_ = _('QUESTION')
-        iques = Question(self.get_message(), self.Graphical, self.Block)
-        #TODO: Duplicate
-        return iques.show()
-
+        return self.ask()
+    
+    def show_question_for_all(self):
+        ''' Ask a question with "Yes to all" and "No to all" answers, see
+            'message.question.controller.YES_ALL'. This allows to ask once
+            for a batch of similar operations.
+        '''
+        if STOP:
+            from skl_shared_qt.message.question.controller import NO
+            return NO
+        return self.ask(True)
 
 FORMAT = Format()
+# Per-function message counters, e.g., 'STATS.get_top(10)'
+STATS = Stats()
+# Recent messages, see 'graphics.log_viewer'. Set this to None to save memory.
+RING = RingBuffer()
+# Set this to None to show all repeated messages
+LIMITER = Limiter()
+atexit.register(flush_limiter)
 rep = Report()
 
 
@@ -1,6 +1,9 @@
 #!/usr/bin/python3
 # -*- coding: UTF-8 -*-
 
+import threading
+
+import PyQt6.QtCore
 import PyQt6.QtWidgets
 
 
@@ -14,3 +17,70 @@ class Message(PyQt6.QtWidgets.QMessageBox):
     
     def set_title(self, text):
         self.setWindowTitle(text)
+
+
+
+class Dispatcher(PyQt6.QtCore.QObject):
+    ''' Show graphical messages in the GUI thread whatever thread they come
+        from. Messages from other threads are passed through a queued signal;
+        blocking messages and questions make the calling thread wait.
+    '''
+    post_signal = PyQt6.QtCore.pyqtSignal(object, str, bool)
+    ask_signal = PyQt6.QtCore.pyqtSignal(object, str, bool)
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.answer = None
+        self.lock = threading.Lock()
+        self.post_signal.connect(self._show, PyQt6.QtCore.Qt.ConnectionType.QueuedConnection)
+        self.ask_signal.connect(self._ask, PyQt6.QtCore.Qt.ConnectionType.BlockingQueuedConnection)
+    
+    def is_gui_thread(self):
+        return PyQt6.QtCore.QThread.currentThread() == self.thread()
+    
+    def _show(self, cls, message, Block):
+        cls(message, True, Block).show()
+    
+    def _ask(self, cls, message, Block):
+        self.answer = cls(message, True, Block).show()
+    
+    def show(self, cls, message, Block=False):
+        if self.is_gui_thread():
+            self._show(cls, message, Block)
+        elif Block:
+            self.ask(cls, message, Block)
+        else:
+            self.post_signal.emit(cls, message, Block)
+    
+    def ask(self, cls, message, Block=False):
+        if self.is_gui_thread():
+            return cls(message, True, Block).show()
+        with self.lock:
+            self.ask_signal.emit(cls, message, Block)
+            return self.answer
+
+
+DISPATCHER = None
+DISPATCHER_LOCK = threading.Lock()
+
+
+def get_dispatcher():
+    ''' Create the dispatcher on the first use rather than on import, since
+        this module can be imported by a worker thread before 'QApplication'
+        exists. An object can only be pushed to another thread from the
+        thread it lives in, so it is moved to the GUI thread right after it
+        is created. Until there is an application, an unbound dispatcher is
+        returned that shows messages in the calling thread.
+    '''
+    global DISPATCHER
+    if DISPATCHER is not None:
+        return DISPATCHER
+    app = PyQt6.QtWidgets.QApplication.instance()
+    if not app:
+        return Dispatcher()
+    with DISPATCHER_LOCK:
+        if DISPATCHER is None:
+            dispatcher = Dispatcher()
+            dispatcher.moveToThread(app.thread())
+            DISPATCHER = dispatcher
+    return DISPATCHER
@@ -83,15 +83,15 @@ class Message:
     
     def show_question(self):
         log.append(self.func, 'question', self.message)
-        try:
-            answer = input()
-        except (EOFError, KeyboardInterrupt):
-            # The user pressed 'Ctrl-c' or 'Ctrl-d'
-            answer = ''
-        answer = answer.lower().strip()
-        if answer in ('y', 'yes'):
-            return True
-        elif answer == 'n':
-            return False
-        else:
-            self.show_question()
+        # Ask again upon invalid input
+        while True:
+            try:
+                answer = input()
+            except (EOFError, KeyboardInterrupt):
+                # The user pressed 'Ctrl-c' or 'Ctrl-d'
+                return False
+            answer = answer.lower().strip()
+            if answer in ('y', 'yes'):
+                return True
+            elif answer in ('n', 'no'):
+                return False
@@ -1,16 +1,24 @@
 #!/usr/bin/python3
 # -*- coding: UTF-8 -*-
 
+# Answers of 'show_for_all'
+YES = 'yes'
+NO = 'no'
+YES_ALL = 'yes_all'
+NO_ALL = 'no_all'
+
 
 class Question:
     ''' message.controller.Message.__init__ sets Graphical=False by default, so
         we have to reassign Graphical anyway when calling Question from shared.
         To quit an app correctly, the last GUI message must be non-blocking.
+        'ForAll' adds "Yes to all" and "No to all" answers, see 'YES_ALL'.
     '''
-    def __init__(self, message, Graphical=False, Block=False):
+    def __init__(self, message, Graphical=False, Block=False, ForAll=False):
         self.message = str(message)
         self.Graphical = Graphical
         self.Block = Block
+        self.ForAll = ForAll
     
     def get(self):
         if self.Graphical:
@@ -25,4 +33,6 @@ class Question:
             return
         iques = self.get()
         iques.set_message(self.message)
+        if self.ForAll:
+            return iques.show_for_all()
         return iques.show_blocked()
@@ -3,6 +3,7 @@
 
 from PyQt6.QtWidgets import QMessageBox
 from skl_shared_qt.localize import _
+from skl_shared_qt.message.question.controller import YES, NO, YES_ALL, NO_ALL
 
 
 class Message(QMessageBox):
@@ -31,6 +32,22 @@ class Message(QMessageBox):
     def show_blocked(self):
         if self.exec() == QMessageBox.StandardButton.Yes:
             return True
+    
+    def show_for_all(self):
+        buttons = QMessageBox.StandardButton
+        self.setStandardButtons(buttons.Yes | buttons.YesToAll | buttons.No \
+                               | buttons.NoToAll)
+        answer = self.exec()
+        self.set_buttons()
+        match answer:
+            case buttons.Yes:
+                return YES
+            case buttons.YesToAll:
+                return YES_ALL
+            case buttons.NoToAll:
+                return NO_ALL
+        # Closing the window is the same as "No"
+        return NO
 
 
 QUESTION = Message()
@@ -1,6 +1,14 @@
 #!/usr/bin/python3
 # -*- coding: UTF-8 -*-
 
+from skl_shared_qt.message.controller import CONSOLE_LOCK
+from skl_shared_qt.message.question.controller import YES, NO, YES_ALL, NO_ALL
+
+ANSWERS = {'y': True, 'yes': True, 'n': None, 'no': None}
+ANSWERS_ALL = {'y': YES, 'yes': YES, 'n': NO, 'no': NO, 'a': YES_ALL
+              ,'all': YES_ALL, 'none': NO_ALL
+              }
+
 
 class Question:
     
@@ -10,28 +18,46 @@ class Question:
     def set_message(self, message):
         self.message = str(message)
     
+    def ask(self, prompt, answers):
+        # Ask again upon invalid input. Ctrl-c and Ctrl-d return None.
+        f = '[SharedQt] message.question.logic.Question.ask'
+        while True:
+            try:
+                # Other threads may print while we are waiting for input
+                with CONSOLE_LOCK:
+                    print(prompt, end='', flush=True)
+                answer = input()
+            except (EOFError, KeyboardInterrupt):
+                return
+            except Exception as e:
+                ''' Rarely somehing like "UnicodeEncodeError: 'utf-8' codec can't
+                    encode character '\udce9' in position 175: surrogates not
+                    allowed" occurs. Since there are too many Unicode exceptions
+                    to except, we do not specify an exception type.
+                '''
+                sub = f'Cannot print the message! ({e})'
+                print(f'{f}:QUESTION:{sub}')
+                return
+            answer = answer.lower().strip()
+            if answer in answers:
+                return answers[answer]
+    
     def show(self):
-        f = '[SharedQt] message.question.logic.Question'
+        f = '[SharedQt] message.question.logic.Question.show'
         if not self.message:
             print(f, 'Empty message!')
             return
-        try:
-            answer = input(f'{self.message}: ')
-            if answer.lower() in ('y', 'yes'):
-                return True
-            elif answer.lower() in ('n', 'no'):
-                return
-            else:
-                #FIX: "No" is always returned
-                self.show()
-        except Exception as e:
-            ''' Rarely somehing like "UnicodeEncodeError: 'utf-8' codec can't
-                encode character '\udce9' in position 175: surrogates not
-                allowed" occurs. Since there are too many Unicode exceptions to
-                except, we do not specify an exception type.
-            '''
-            sub = f'Cannot print the message! ({e})'
-            print(f'{f}:QUESTION:{sub}')
+        return self.ask(f'{self.message} (y/n): ', ANSWERS)
+    
+    def show_for_all(self):
+        f = '[SharedQt] message.question.logic.Question.show_for_all'
+        if not self.message:
+            print(f, 'Empty message!')
+            return NO
+        answer = self.ask(f'{self.message} (y/n/all/none): ', ANSWERS_ALL)
+        if answer is None:
+            return NO_ALL
+        return answer
     
     def show_blocked(self):
         return self.show()
@@ -0,0 +1,445 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+''' Message records, their statistics and console, file and socket outputs.
+    'AsyncLog' moves writing to a background thread. #NOTE: Do not use
+    'message.controller' here, this module is used by it.
+'''
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import struct
+import threading
+
+# count, time, level
+BINARY_HEADER = struct.Struct('<IdB')
+BINARY_LEN = struct.Struct('<I')
+
+
+class Record:
+    
+    __slots__ = ('count', 'time', 'level', 'type_', 'func', 'message'
+                ,'thread')
+    
+    def __init__(self, count, level, type_, func, message, time_=None
+                ,thread=''):
+        self.count = count
+        if time_ is None:
+            self.time = time.time()
+        else:
+            self.time = time_
+        self.level = level
+        self.type_ = type_
+        self.func = func
+        self.message = message
+        if thread:
+            self.thread = thread
+        else:
+            self.thread = threading.current_thread().name
+    
+    def get_line(self):
+        return f'{self.count}:{self.func}:{self.type_}:{self.message}'
+    
+    def get_dict(self):
+        return {'count': self.count, 'time': self.time, 'level': self.level
+               ,'type': self.type_, 'func': self.func, 'message': self.message
+               ,'thread': self.thread
+               }
+    
+    def pack(self):
+        # A header followed by length-prefixed UTF-8 strings
+        chunks = [BINARY_HEADER.pack(self.count, self.time, self.level)]
+        for text in (self.type_, self.func, self.message, self.thread):
+            text = text.encode('UTF-8', 'replace')
+            chunks.append(BINARY_LEN.pack(len(text)))
+            chunks.append(text)
+        return b''.join(chunks)
+
+
+
+def read_binary(file):
+    # Yield records written by 'BinarySink'
+    with open(file, 'rb') as fl:
+        while True:
+            header = fl.read(BINARY_HEADER.size)
+            if len(header) < BINARY_HEADER.size:
+                return
+            count, time_, level = BINARY_HEADER.unpack(header)
+            texts = []
+            for i in range(4):
+                len_ = BINARY_LEN.unpack(fl.read(BINARY_LEN.size))[0]
+                texts.append(fl.read(len_).decode('UTF-8', 'replace'))
+            yield Record (count = count
+                         ,level = level
+                         ,type_ = texts[0]
+                         ,func = texts[1]
+                         ,message = texts[2]
+                         ,time_ = time_
+                         ,thread = texts[3]
+                         )
+
+
+
+class Stats:
+    ''' Per-function message counters, e.g., to find the noisiest call sites:
+        STATS.get_top(10) -> [(func, count, rate per second), ...]
+        The rate is calculated over the last 'window' seconds.
+    '''
+    def __init__(self, window=60):
+        self.window = window
+        self.lock = threading.Lock()
+        self.reset()
+    
+    def reset(self):
+        self.start = time.monotonic()
+        # {func: [total, {level: count}, window start, window count, rate]}
+        self.funcs = {}
+    
+    def add(self, func, level):
+        now = time.monotonic()
+        with self.lock:
+            item = self.funcs.get(func)
+            if item is None:
+                item = self.funcs[func] = [0, {}, now, 0, 0.0]
+            item[0] += 1
+            item[1][level] = item[1].get(level, 0) + 1
+            if now - item[2] >= self.window:
+                item[4] = item[3] / (now - item[2])
+                item[2] = now
+                item[3] = 0
+            item[3] += 1
+    
+    def get_count(self, func):
+        item = self.funcs.get(func)
+        if item:
+            return item[0]
+        return 0
+    
+    def get_levels(self, func):
+        item = self.funcs.get(func)
+        if item:
+            return dict(item[1])
+        return {}
+    
+    def get_rate(self, func):
+        # Messages per second (over the current window if it is not over yet)
+        item = self.funcs.get(func)
+        if not item:
+            return 0.0
+        now = time.monotonic()
+        delta = now - item[2]
+        if item[4] and delta < self.window:
+            return item[4]
+        ''' A single message right after the first one would give thousands
+            of messages per second, so count the first window from the start
+            of statistics and never divide by less than a second.
+        '''
+        delta = max(delta, min(self.window, now - self.start), 1.0)
+        return item[3] / delta
+    
+    def get_top(self, limit=10):
+        with self.lock:
+            funcs = sorted(self.funcs, key=lambda func: self.funcs[func][0]
+                          ,reverse=True)
+        return [(func, self.get_count(func), self.get_rate(func)) \
+                for func in funcs[:limit]]
+    
+    def get_total(self):
+        with self.lock:
+            return sum([item[0] for item in self.funcs.values()])
+
+
+
+class RingBuffer:
+    ''' Keep the last 'size' records. The storage is preallocated, appending
+        is O(1) and never reallocates.
+    '''
+    def __init__(self, size=10000):
+        self.size = size
+        self.items = [None] * size
+        self.pos = 0
+        # The total number of appended records (including overwritten ones)
+        self.total = 0
+        self.lock = threading.Lock()
+    
+    def append(self, record):
+        with self.lock:
+            self.items[self.pos] = record
+            self.pos = (self.pos + 1) % self.size
+            self.total += 1
+    
+    def __len__(self):
+        return min(self.total, self.size)
+    
+    def get_all(self):
+        # Return a snapshot of records, oldest first
+        with self.lock:
+            if self.total < self.size:
+                return self.items[:self.total]
+            return self.items[self.pos:] + self.items[:self.pos]
+    
+    def get_since(self, total):
+        ''' Return records appended after the first 'total' ones (as many of
+            them as are still kept) and the current total. If the buffer has
+            been cleared since, all records are returned.
+        '''
+        with self.lock:
+            count = min(self.total, self.size)
+            if 0 <= total <= self.total:
+                count = min(count, self.total - total)
+            if count <= 0:
+                return [], self.total
+            start = (self.pos - count) % self.size
+            if start < self.pos:
+                return self.items[start:self.pos], self.total
+            return self.items[start:] + self.items[:self.pos], self.total
+    
+    def clear(self):
+        with self.lock:
+            self.items = [None] * self.size
+            self.pos = 0
+            self.total = 0
+
+
+
+class ConsoleSink:
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, records):
+        stream = self.stream or sys.stdout
+        try:
+            stream.write(''.join([record.get_line() + '\n' for record in records]))
+            stream.flush()
+        except Exception as e:
+            ''' Rarely somehing like "UnicodeEncodeError: 'utf-8' codec can't
+                encode character '\udce9' in position 175: surrogates not
+                allowed" occurs. Since there are too many Unicode exceptions to
+                except, we do not specify an exception type.
+            '''
+            print(f'[SharedQt] message.sink.ConsoleSink.write:WARNING:Cannot print the message! ({e})')
+
+    def close(self):
+        pass
+
+
+
+class FileSink:
+    # Rotate 'file' -> 'file.1' -> ... -> 'file.<backups>' upon 'max_bytes'
+    def __init__(self, file, max_bytes=10485760, backups=3):
+        self.file = file
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.fl = None
+        self.size = 0
+
+    def open(self):
+        self.fl = open(self.file, 'a', encoding='UTF-8', errors='replace')
+        self.size = self.fl.tell()
+
+    def rotate(self):
+        self.close()
+        for i in range(self.backups - 1, 0, -1):
+            src = f'{self.file}.{i}'
+            if os.path.exists(src):
+                os.replace(src, f'{self.file}.{i+1}')
+        if self.backups > 0:
+            os.replace(self.file, f'{self.file}.1')
+        else:
+            os.remove(self.file)
+        self.open()
+
+    def write(self, records):
+        f = '[SharedQt] message.sink.FileSink.write'
+        try:
+            if not self.fl:
+                self.open()
+            text = ''.join([record.get_line() + '\n' for record in records])
+            self.fl.write(text)
+            self.fl.flush()
+            self.size += len(text)
+            if self.max_bytes and self.size >= self.max_bytes:
+                self.rotate()
+        except Exception as e:
+            print(f'{f}:WARNING:Unable to write file "{self.file}"! ({e})')
+
+    def close(self):
+        if self.fl:
+            self.fl.close()
+            self.fl = None
+
+
+
+class JsonSink(FileSink):
+    # Write records as JSON Lines
+    def write(self, records):
+        f = '[SharedQt] message.sink.JsonSink.write'
+        try:
+            if not self.fl:
+                self.open()
+            text = ''.join([json.dumps(record.get_dict(), ensure_ascii=False) \
+                            + '\n' for record in records])
+            self.fl.write(text)
+            self.fl.flush()
+            self.size += len(text)
+            if self.max_bytes and self.size >= self.max_bytes:
+                self.rotate()
+        except Exception as e:
+            print(f'{f}:WARNING:Unable to write file "{self.file}"! ({e})')
+
+
+
+class BinarySink(FileSink):
+    # Write records in a compact binary format, see 'read_binary'
+    def open(self):
+        self.fl = open(self.file, 'ab')
+        self.size = self.fl.tell()
+    
+    def write(self, records):
+        f = '[SharedQt] message.sink.BinarySink.write'
+        try:
+            if not self.fl:
+                self.open()
+            data = b''.join([record.pack() for record in records])
+            self.fl.write(data)
+            self.fl.flush()
+            self.size += len(data)
+            if self.max_bytes and self.size >= self.max_bytes:
+                self.rotate()
+        except Exception as e:
+            print(f'{f}:WARNING:Unable to write file "{self.file}"! ({e})')
+
+
+
+class SocketSink:
+    # Send lines over TCP, reconnect upon failures
+    def __init__(self, host='127.0.0.1', port=9020, timeout=3):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = None
+
+    def write(self, records):
+        f = '[SharedQt] message.sink.SocketSink.write'
+        data = ''.join([record.get_line() + '\n' for record in records])
+        try:
+            if not self.sock:
+                import socket
+                self.sock = socket.create_connection((self.host, self.port)
+                                                    ,self.timeout)
+            self.sock.sendall(data.encode('UTF-8', 'replace'))
+        except Exception as e:
+            self.close()
+            print(f'{f}:WARNING:Unable to send messages to {self.host}:{self.port}! ({e})')
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
+
+class AsyncLog:
+    ''' Producers only put compact records to a bounded queue; a background
+        thread writes them to sinks in batches. If the queue is full, either
+        the new record is dropped ('Drop=True', never blocks) or the producer
+        waits ('Drop=False'). The queue is flushed at exit.
+    '''
+    def __init__(self, sinks=(), maxsize=10000, batch=500, Drop=True):
+        if sinks:
+            self.sinks = list(sinks)
+        else:
+            self.sinks = [ConsoleSink()]
+        self.queue = queue.Queue(maxsize)
+        self.batch = batch
+        self.Drop = Drop
+        self.dropped = 0
+        self.Running = False
+        self.thread = None
+        self.start()
+
+    def start(self):
+        if self.Running:
+            return
+        self.Running = True
+        self.thread = threading.Thread(target=self.loop, daemon=True
+                                      ,name='SharedQtLog')
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def put(self, record):
+        if not self.Running:
+            ConsoleSink().write((record,))
+            return
+        try:
+            if self.Drop:
+                self.queue.put_nowait(record)
+            else:
+                self.queue.put(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self, records):
+        if self.dropped:
+            # Not thread-safe, but this is a rough number anyway
+            dropped, self.dropped = self.dropped, 0
+            records.append(Record (count = 0
+                                  ,level = 30
+                                  ,type_ = 'WARNING'
+                                  ,func = '[SharedQt] message.sink.AsyncLog.put'
+                                  ,message = f'{dropped} messages have been dropped'
+                                  ))
+        f = '[SharedQt] message.sink.AsyncLog._write'
+        for sink in self.sinks:
+            # A failing sink must not stop the writer thread
+            try:
+                sink.write(records)
+            except Exception as e:
+                sub = f'Unable to write messages to {type(sink).__name__}! ({e})'
+                print(f'{f}:WARNING:{sub}', file=sys.stderr)
+
+    def loop(self):
+        while True:
+            record = self.queue.get()
+            # None is a signal to stop
+            records = [record]
+            try:
+                while len(records) < self.batch:
+                    records.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            count = len(records)
+            Stop = None in records
+            records = [record for record in records if record is not None]
+            if records:
+                self._write(records)
+            for i in range(count):
+                self.queue.task_done()
+            if Stop:
+                return
+
+    def flush(self):
+        # Wait until all queued records are written
+        if self.Running:
+            self.queue.join()
+
+    def stop(self):
+        if not self.Running:
+            return
+        self.Running = False
+        # Do not drop the stop signal, but do not hang if the thread is dead
+        if self.thread.is_alive():
+            try:
+                self.queue.put(None, timeout=5)
+            except queue.Full:
+                pass
+            self.thread.join(5)
+        for sink in self.sinks:
+            sink.close()
@@ -2,6 +2,8 @@
 # -*- coding: UTF-8 -*-
 
 import os
+import string
+import functools
 import subprocess
 import urllib.parse
 import webbrowser
@@ -12,6 +14,107 @@ from skl_shared_qt.logic import OS, Input
 from skl_shared_qt.paths import File
 
 
+@functools.lru_cache(maxsize=4096)
+def quote_bytes(value, safe='/'):
+    # Terms are often repeated in batches, so keep recently quoted ones
+    return urllib.parse.quote(value, safe=safe)
+
+
+def quote(value, coding='UTF-8', safe='/'):
+    return quote_bytes(bytes(value, encoding=coding), safe)
+
+
+
+class Template:
+    ''' A URL template that is parsed once and then builds many URLs, e.g.:
+        itemplate = Template('https://example.com/{}/search?q={term}')
+        itemplate.build('en', term='dog', page=2)
+        -> 'https://example.com/en/search?q=dog&page=2'
+        itemplate.build_many(('dog', 'cat'), 'en')
+        Positional and named placeholders use the 'str.format' syntax; the
+        old '%s' syntax of 'Online' is supported as well. Keyword arguments
+        that are not placeholders are appended as query parameters. Values
+        are quoted like in 'Online.get_url'.
+    '''
+    def __init__(self, base='{}', coding='UTF-8', safe='/'):
+        self.base = base
+        self.coding = coding
+        self.safe = safe
+        # [literal, placeholder, literal, placeholder, ...]
+        self.parts = []
+        self.names = set()
+        self.compile()
+    
+    def compile(self):
+        if '{' not in self.base and '%s' in self.base:
+            chunks = self.base.split('%s')
+            for chunk in chunks[:-1]:
+                self.parts.append(chunk.replace('%%', '%'))
+                self.parts.append('')
+            self.parts.append(chunks[-1].replace('%%', '%'))
+            return
+        pos = 0
+        literal = ''
+        for chunk, name, spec, conv in string.Formatter().parse(self.base):
+            # Escaped braces ('{{', '}}') split literals into several chunks
+            literal += chunk
+            if name is None:
+                continue
+            self.parts.append(literal)
+            literal = ''
+            if name == '':
+                name = pos
+                pos += 1
+            elif name.isdigit():
+                name = int(name)
+            else:
+                self.names.add(name)
+            self.parts.append(name)
+        self.parts.append(literal)
+    
+    def quote(self, value):
+        return quote(str(value), self.coding, self.safe)
+    
+    def build(self, *args, **kwargs):
+        f = '[SharedQt] online.Template.build'
+        items = []
+        pos = 0
+        try:
+            for i in range(len(self.parts)):
+                part = self.parts[i]
+                if i % 2 == 0:
+                    items.append(part)
+                elif part == '':
+                    # '%s'
+                    items.append(self.quote(args[pos]))
+                    pos += 1
+                elif isinstance(part, int):
+                    items.append(self.quote(args[part]))
+                else:
+                    items.append(self.quote(kwargs[part]))
+        except (IndexError, KeyError) as e:
+            mes = _('Wrong input data: {}!').format(e)
+            Message(f, mes).show_warning()
+            return ''
+        query = [f'{self.quote(key)}={self.quote(value)}' \
+                 for key, value in kwargs.items() if key not in self.names]
+        if query:
+            if '?' in self.base:
+                items.append('&')
+            else:
+                items.append('?')
+            items.append('&'.join(query))
+        return ''.join(items)
+    
+    def build_many(self, patterns, *args, **kwargs):
+        # Build URLs for many terms, other arguments are the same for all URLs
+        f = '[SharedQt] online.Template.build_many'
+        urls = [self.build(pattern, *args, **kwargs) for pattern in patterns]
+        Message(f, _('{} URLs'), args=(len(urls),)).show_debug()
+        return urls
+
+
+
 class Online:
     ''' If you get 'TypeError("quote_from_bytes() expected bytes")', then you
         probably forgot to call 'self.reset' here or in children classes.
@@ -43,7 +146,8 @@ class Online:
         # Create a correct online link (URI => URL)
         f = '[SharedQt] online.Online.get_url'
         if not self.url:
-            self.url = self.base % urllib.parse.quote(self.get_bytes())
+            # Children classes may override 'get_bytes'
+            self.url = self.base % quote_bytes(self.get_bytes())
             mes = str(self.url)
             Message(f, mes).show_debug()
         return self.url
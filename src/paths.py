@@ -59,15 +59,15 @@ class Path:
             return Success
         if os.path.exists(self.path):
             if os.path.isdir(self.path):
-                mes = _('Directory "{}" already exists.').format(self.path)
-                Message(f, mes).show_info()
+                mes = _('Directory "{}" already exists.')
+                Message(f, mes, args=(self.path,)).show_info()
             else:
                 Success = False
                 mes = _('The path "{}" is invalid!').format(self.path)
                 Message(f, mes, True).show_warning()
         else:
-            mes = _('Create directory "{}"').format(self.path)
-            Message(f, mes).show_info()
+            mes = _('Create directory "{}"')
+            Message(f, mes, args=(self.path,)).show_info()
             try:
                 #TODO: consider os.mkdir
                 os.makedirs(self.path)
@@ -215,10 +215,14 @@ class Home:
 
 class File:
 
-    def __init__(self, file, dest=None, Rewrite=False):
+    def __init__(self, file, dest=None, Rewrite=False, policy=None):
+        ''' Pass the same 'rewrite.Policy' to a batch of files to avoid asking
+            for each file.
+        '''
         f = '[SharedQt] paths.File.__init__'
         self.Success = True
         self.Rewrite = Rewrite
+        self.policy = policy
         self.file = file
         self.dest = dest
         # This will allow to skip some checks for destination
@@ -272,8 +276,8 @@ class File:
     def _copy(self):
         f = '[SharedQt] paths.File._copy'
         Success = True
-        mes = _('Copy "{}" to "{}"').format(self.file, self.dest)
-        Message(f, mes).show_info()
+        mes = _('Copy "{}" to "{}"')
+        Message(f, mes, args=(self.file, self.dest)).show_info()
         try:
             shutil.copyfile(self.file, self.dest)
         except:
@@ -286,8 +290,8 @@ class File:
     def _move(self):
         f = '[SharedQt] paths.File._move'
         Success = True
-        mes = _('Move "{}" to "{}"').format(self.file, self.dest)
-        Message(f, mes).show_info()
+        mes = _('Move "{}" to "{}"')
+        Message(f, mes, args=(self.file, self.dest)).show_info()
         try:
             shutil.move(self.file, self.dest)
         except Exception as e:
@@ -320,7 +324,7 @@ class File:
         if self.file.lower() == self.dest.lower():
             mes = _('Unable to copy the file "{}" to itself!').format(self.file)
             Message(f, mes, True).show_error()
-        elif self.Rewrite or rewrite(self.dest):
+        elif self.Rewrite or rewrite(self.dest, self.policy):
             Success = self._copy()
         else:
             mes = _('Operation has been canceled by the user.')
@@ -332,8 +336,7 @@ class File:
         if not self.Success:
             rep.cancel(f)
             return
-        mes = _('Delete "{}"').format(self.file)
-        Message(f, mes).show_info()
+        Message(f, _('Delete "{}"'), args=(self.file,)).show_info()
         try:
             os.remove(self.file)
             return True
@@ -365,7 +368,7 @@ class File:
             mes = _('Moving is not necessary, because the source and destination are identical ({}).')
             mes = mes.format(self.file)
             Message(f, mes, True).show_warning()
-        elif self.Rewrite or rewrite(self.dest):
+        elif self.Rewrite or rewrite(self.dest, self.policy):
             Success = self._move()
         else:
             mes = _('Operation has been canceled by the user.')
@@ -417,8 +420,8 @@ class Directory:
     def _move(self):
         f = '[SharedQt] paths.Directory._move'
         Success = True
-        mes = _('Move "{}" to "{}"').format(self.dir, self.dest)
-        Message(f, mes).show_info()
+        mes = _('Move "{}" to "{}"')
+        Message(f, mes, args=(self.dir, self.dest)).show_info()
         try:
             shutil.move(self.dir, self.dest)
         except Exception as e:
@@ -540,8 +543,7 @@ class Directory:
         if not self.Success:
             rep.cancel(f)
             return
-        mes = _('Delete "{}"').format(self.dir)
-        Message(f, mes).show_info()
+        Message(f, _('Delete "{}"'), args=(self.dir,)).show_info()
         try:
             shutil.rmtree(self.dir)
             return True
@@ -644,8 +646,8 @@ class Directory:
 
     def _copy(self):
         f = '[SharedQt] paths.Directory._copy'
-        mes = _('Copy "{}" to "{}"').format(self.dir, self.dest)
-        Message(f, mes).show_info()
+        mes = _('Copy "{}" to "{}"')
+        Message(f, mes, args=(self.dir, self.dest)).show_info()
         try:
             shutil.copytree(self.dir, self.dest)
         except:
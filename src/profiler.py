@@ -0,0 +1,285 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+''' Time functions by their "f = '[SharedQt] ...'" tags without changing
+    callers:
+        PROFILER.enable('text_file.*')
+        PROFILER.enable('get_url.*', rate=10)
+        PROFILER.start()
+        ...
+        PROFILER.stop()
+        PROFILER.show()
+    'rate=1' times every call, 'rate=N' times every Nth call of a tag (calls
+    are still counted). A tag is the first string constant of a function that
+    starts with the prefix, so functions without tags cost a dictionary lookup.
+    Recursive calls of the same tag are timed more than once. On Python 3.12+
+    all running threads are profiled, on older versions - only the thread that
+    calls 'start' and threads started after it.
+'''
+
+import sys
+import time
+import random
+import fnmatch
+import threading
+import contextlib
+
+from skl_shared_qt.localize import _
+from skl_shared_qt.message.controller import Message, rep, CONSOLE_LOCK
+from skl_shared_qt.table import Table
+
+PREFIX = '[SharedQt] '
+# The number of durations per tag kept to estimate percentiles
+SAMPLES = 1000
+
+
+class Tag:
+
+    __slots__ = ('title', 'rate', 'calls', 'timed', 'total', 'min', 'max'
+                ,'samples')
+
+    def __init__(self, title, rate=1):
+        self.title = title
+        self.rate = rate
+        self.calls = 0
+        self.timed = 0
+        self.total = 0.0
+        self.min = 0.0
+        self.max = 0.0
+        self.samples = []
+
+    def add(self, delta):
+        if self.timed:
+            self.min = min(self.min, delta)
+            self.max = max(self.max, delta)
+        else:
+            self.min = self.max = delta
+        self.timed += 1
+        self.total += delta
+        # Reservoir sampling keeps a uniform sample of all durations
+        if len(self.samples) < SAMPLES:
+            self.samples.append(delta)
+        else:
+            i = random.randrange(self.timed)
+            if i < SAMPLES:
+                self.samples[i] = delta
+
+    def get_cumulative(self):
+        # Estimate the time of all calls if only some of them were timed
+        if not self.timed:
+            return 0.0
+        return self.total * self.calls / self.timed
+
+    def get_mean(self):
+        if not self.timed:
+            return 0.0
+        return self.total / self.timed
+
+    def get_percentile(self, percent):
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        i = round(percent / 100 * (len(samples) - 1))
+        return samples[i]
+
+
+
+class Profiler:
+
+    def __init__(self, prefix=PREFIX):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.Running = False
+        # [(pattern, rate), ...], the last matching rule wins
+        self.rules = []
+        # {code: Tag or None}
+        self.codes = {}
+        # {title: Tag}
+        self.tags = {}
+
+    def enable(self, pattern='*', rate=1):
+        ''' Time tags matching a shell-style pattern, e.g., 'text_file.Read.*'.
+            Patterns are matched against tags without the prefix since
+            brackets have a special meaning in patterns.
+        '''
+        pattern = pattern.removeprefix(self.prefix)
+        with self.lock:
+            self.rules.append((pattern, max(1, int(rate))))
+            self.codes = {}
+            for tag in self.tags.values():
+                tag.rate = self.get_rate(tag.title)
+
+    def disable(self, pattern=None):
+        # Stop timing tags matching 'pattern' or all tags
+        if pattern is None:
+            rules = []
+        else:
+            pattern = pattern.removeprefix(self.prefix)
+            rules = [rule for rule in self.rules if rule[0] != pattern]
+        with self.lock:
+            self.rules = rules
+            self.codes = {}
+
+    def get_rate(self, title):
+        rate = 0
+        title = title.removeprefix(self.prefix)
+        for pattern, rate_ in self.rules:
+            if fnmatch.fnmatchcase(title, pattern):
+                rate = rate_
+        return rate
+
+    def get_title(self, code):
+        for item in code.co_consts:
+            if isinstance(item, str) and item.startswith(self.prefix):
+                return item
+
+    def get_tag(self, code):
+        # This is called for every function call, so cache by code objects
+        try:
+            return self.codes[code]
+        except KeyError:
+            pass
+        tag = None
+        title = self.get_title(code)
+        if title:
+            rate = self.get_rate(title)
+            if rate:
+                with self.lock:
+                    tag = self.tags.get(title)
+                    if tag is None:
+                        tag = self.tags[title] = Tag(title, rate)
+        self.codes[code] = tag
+        return tag
+
+    def get_frames(self):
+        try:
+            return self.local.frames
+        except AttributeError:
+            self.local.frames = {}
+            return self.local.frames
+
+    def hook(self, frame, event, arg):
+        # Python < 3.12 cannot remove the hook from other running threads
+        if not self.Running:
+            sys.setprofile(None)
+            return
+        if event == 'call':
+            tag = self.get_tag(frame.f_code)
+            if tag is None:
+                return
+            with self.lock:
+                tag.calls += 1
+                Timed = tag.calls % tag.rate == 0
+            if Timed:
+                self.get_frames()[frame] = time.perf_counter()
+        elif event == 'return':
+            frames = self.get_frames()
+            if frame in frames:
+                delta = time.perf_counter() - frames.pop(frame)
+                tag = self.codes.get(frame.f_code)
+                if tag is not None:
+                    with self.lock:
+                        tag.add(delta)
+
+    def set_hook(self, hook):
+        # Python < 3.12 cannot set a hook in threads that are already running
+        if hasattr(threading, 'setprofile_all_threads'):
+            threading.setprofile_all_threads(hook)
+        else:
+            threading.setprofile(hook)
+            sys.setprofile(hook)
+    
+    def start(self):
+        f = '[SharedQt] profiler.Profiler.start'
+        if self.Running:
+            return
+        if not self.rules:
+            rep.lazy(f)
+            return
+        self.Running = True
+        self.set_hook(self.hook)
+
+    def stop(self):
+        if not self.Running:
+            return
+        self.Running = False
+        self.set_hook(None)
+        # Drop start times of unfinished calls in all threads
+        self.local = threading.local()
+
+    def reset(self):
+        with self.lock:
+            self.codes = {}
+            self.tags = {}
+
+    def add(self, title, delta):
+        # Add a duration measured elsewhere, e.g., by 'time.Timer'
+        with self.lock:
+            tag = self.tags.get(title)
+            if tag is None:
+                tag = self.tags[title] = Tag(title)
+            tag.calls += 1
+            tag.add(delta)
+
+    @contextlib.contextmanager
+    def measure(self, title):
+        # Time a block of code that is not a separate function
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(title, time.perf_counter() - start)
+
+    def get_top(self, limit=20):
+        with self.lock:
+            tags = [tag for tag in self.tags.values() if tag.calls]
+        tags.sort(key=lambda tag: tag.get_cumulative(), reverse=True)
+        if limit:
+            tags = tags[:limit]
+        return tags
+
+    def report(self, limit=20):
+        f = '[SharedQt] profiler.Profiler.report'
+        tags = self.get_top(limit)
+        if not tags:
+            rep.empty(f)
+            return ''
+        headers = (_('Tag'), _('Calls'), _('Timed'), _('Total, s')
+                  ,_('Mean, ms'), _('p50, ms'), _('p95, ms'), _('p99, ms')
+                  ,_('Max, ms'))
+        rows = []
+        for tag in tags:
+            rows.append ([tag.title.removeprefix(self.prefix), tag.calls
+                         ,tag.timed, f'{tag.get_cumulative():.3f}'
+                         ,f'{tag.get_mean()*1000:.3f}'
+                         ,f'{tag.get_percentile(50)*1000:.3f}'
+                         ,f'{tag.get_percentile(95)*1000:.3f}'
+                         ,f'{tag.get_percentile(99)*1000:.3f}'
+                         ,f'{tag.max*1000:.3f}'
+                        ])
+        # 'Table' expects columns
+        return Table (iterable = [*zip(*rows)]
+                     ,headers = headers
+                     ,maxrow = 60
+                     ,CutStart = True
+                     ).run()
+
+    def show(self, limit=20, Graphical=False):
+        f = '[SharedQt] profiler.Profiler.show'
+        report = self.report(limit)
+        if not report:
+            return
+        mes = _('Profiled tags: {}')
+        Message(f, mes, args=(len(self.tags),)).show_info()
+        # Messages are shortened, so the table is passed to backends as is
+        if Graphical:
+            from skl_shared_qt.graphics.debug.controller import DEBUG
+            DEBUG.reset(f, report)
+            DEBUG.show()
+            return
+        from skl_shared_qt.message.debug.controller import Debug
+        with CONSOLE_LOCK:
+            Debug(report).show()
+
+
+PROFILER = Profiler()
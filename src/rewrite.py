@@ -5,10 +5,72 @@ import os
 
 from skl_shared_qt.localize import _
 from skl_shared_qt.message.controller import Message
+from skl_shared_qt.message.question.controller import YES, YES_ALL, NO_ALL
 
 
-def rewrite(file):
+class Policy:
+    ''' Decide whether existing files should be rewritten without asking for
+        each file of a batch, e.g.:
+        policy = Policy()
+        policy.ask_batch(dests)
+        for file, dest in zip(files, dests):
+            File(file, dest, policy=policy).copy()
+        If 'ask_batch' is not called, the user is asked upon the first
+        conflict and can answer "Yes to all" or "No to all".
+    '''
+    def __init__(self, answer=None):
+        # None: ask, True: rewrite all files, False: skip all files
+        self.answer = answer
+        self.skipped = []
+    
+    def get_conflicts(self, files):
+        return [file for file in files if os.path.isfile(file)]
+    
+    def ask_batch(self, files):
+        # Ask once for all files that already exist
+        f = '[SharedQt] rewrite.Policy.ask_batch'
+        if self.answer is not None:
+            return self.answer
+        conflicts = self.get_conflicts(files)
+        if not conflicts:
+            return
+        if len(conflicts) == 1:
+            return self.ask(conflicts[0])
+        mes = _('ATTENTION: {} files already exist, e.g., "{}". Do you really want to rewrite them all?')
+        mes = mes.format(len(conflicts), conflicts[0])
+        self.answer = bool(Message(f, mes, True).show_question())
+        Message(f, self.answer).show_debug()
+        return self.answer
+    
+    def ask(self, file):
+        f = '[SharedQt] rewrite.Policy.ask'
+        if not os.path.isfile(file):
+            # Return True to proceed with writing if the file has not been found
+            return True
+        if self.answer is None:
+            mes = _('ATTENTION: Do yo really want to rewrite file "{}"?')
+            mes = mes.format(file)
+            answer = Message(f, mes, True).show_question_for_all()
+            Message(f, answer).show_debug()
+            if answer == YES_ALL:
+                self.answer = True
+            elif answer == NO_ALL:
+                self.answer = False
+            elif answer == YES:
+                return True
+            else:
+                self.skipped.append(file)
+                return False
+        if not self.answer:
+            self.skipped.append(file)
+        return self.answer
+
+
+
+def rewrite(file, policy=None):
     f = '[SharedQt] rewrite.rewrite'
+    if policy:
+        return policy.ask(file)
     if not os.path.isfile(file):
         # Return True to proceed with writing if the file has not been found
         return True
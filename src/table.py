@@ -2,17 +2,39 @@
 # -*- coding: UTF-8 -*-
 
 import io
+import array
+import itertools
 
 from skl_shared_qt.localize import _
 from skl_shared_qt.message.controller import Message, rep
-from skl_shared_qt.basic_text import Shorten, Enclose
+from skl_shared_qt.basic_text import Enclose, shorten, shorten_many, get_width
+
+
+def is_numpy(obj):
+    # Do not import NumPy just to check the type
+    return type(obj).__module__ == 'numpy'
+
+
+def is_columnar(obj):
+    # Check if 'Table' input can be rendered by 'Columns'
+    if isinstance(obj, dict) or is_numpy(obj):
+        return True
+    if isinstance(obj, (list, tuple)) and obj:
+        return isinstance(obj[0], array.array) or is_numpy(obj[0])
+    return False
+
 
 
 class Table:
     
     def __init__(self, iterable=[], headers=[], sep=' ', Transpose=False
-                ,maxrow=0, CutStart=False, maxrows=0, encloser='', ShowGap=True):
-        # #NOTE: In case of tuple, do not forget to add commas, e.g.: ((1,),)
+                ,maxrow=0, CutStart=False, maxrows=0, encloser='', ShowGap=True
+                ,Display=False):
+        ''' #NOTE: In case of tuple, do not forget to add commas, e.g.: ((1,),)
+            'Display=True' measures cells in columns of a monospace font
+            rather than in symbols, so wide (CJK) and combining characters
+            are aligned.
+        '''
         self.Success = True
         self.lens = []
         self.encloser = encloser
@@ -24,6 +46,12 @@ class Table:
         self.sep = sep
         self.Transpose = Transpose
         self.ShowGap = ShowGap
+        self.Display = Display
+    
+    def get_len(self, text):
+        if self.Display:
+            return get_width(text)
+        return len(text)
     
     def set_max_rows(self):
         f = '[SharedQt] table.Table.set_max_rows'
@@ -54,9 +82,8 @@ class Table:
         else:
             max_len = self.maxrow
         for i in range(len(self.lst)):
-            for j in range(len(self.lst[i])):
-                text = str(self.lst[i][j])
-                self.lst[i][j] = Shorten(text, max_len, self.CutStart, self.ShowGap).run()
+            self.lst[i] = shorten_many(self.lst[i], max_len, self.CutStart
+                                      ,self.ShowGap, Display=self.Display)
     
     def enclose(self):
         ''' Passing 'encloser' in 'Text.shorten' is not enough since it
@@ -113,7 +140,7 @@ class Table:
         iwrite = io.StringIO()
         for j in range(len(self.lst[0])):
             for i in range(len(self.lst)):
-                delta = self.lens[i] - len(self.lst[i][j])
+                delta = self.lens[i] - self.get_len(self.lst[i][j])
                 iwrite.write(self.lst[i][j])
                 iwrite.write(' ' * delta)
                 if i + 1 < len(self.lst):
@@ -145,8 +172,7 @@ class Table:
             rep.cancel(f)
             return
         for item in self.lst:
-            tmp = sorted(item, key=len, reverse=True)
-            self.lens.append(len(tmp[0]))
+            self.lens.append(max(map(self.get_len, item), default=0))
     
     def make_list(self):
         f = '[SharedQt] table.Table.make_list'
@@ -166,7 +192,28 @@ class Table:
             mes = _('Only iterable objects are supported!')
             Message(f, mes, True).show_warning()
     
+    def run_columns(self):
+        # Columnar data is rendered as is instead of building lists
+        columns = self.lst
+        if self.Transpose and is_numpy(columns):
+            # A view, not a copy
+            columns = columns.T
+        elif self.Transpose:
+            columns = list(zip(*columns))
+        return Columns (columns = columns
+                       ,headers = self.headers
+                       ,sep = self.sep
+                       ,maxrow = self.maxrow
+                       ,CutStart = self.CutStart
+                       ,ShowGap = self.ShowGap
+                       ,encloser = self.encloser
+                       ,maxrows = self.maxrows
+                       ,Display = self.Display
+                       ).run()
+    
     def run(self):
+        if is_columnar(self.lst):
+            return self.run_columns()
         self.make_list()
         self.transpose()
         self.set_headers()
@@ -176,3 +223,311 @@ class Table:
         self.add_gap()
         self.get_lens()
         return self.report()
+
+
+
+class Stream:
+    ''' Render rows (not columns as in 'Table') to any object having 'write'
+        without keeping the whole output in memory, e.g.:
+        with open(file, 'w') as fl:
+            Stream(rows, headers, fl, maxrow=50).run()
+        Column widths are calculated by the first 'sample' rows, so 'rows'
+        can be a generator and the memory usage does not depend on the number
+        of rows. Set 'sample=0' to calculate widths by all rows in a single
+        pass (a list is required then since rows are read twice); the output
+        is the same as of 'Table'. Cells longer than their column are written
+        as is unless 'Fit' is set. If there is no 'writer', 'run' returns the
+        text. See also 'get_page' and 'append'. 'Display' is the same as in
+        'Table'.
+    '''
+    def __init__(self, rows=(), headers=(), writer=None, sep=' ', maxrow=0
+                ,CutStart=False, ShowGap=True, encloser='', sample=1000
+                ,Fit=False, batch=1000, Display=False):
+        self.Success = True
+        self.rows = rows
+        self.headers = headers
+        self.writer = writer
+        self.sep = sep
+        self.maxrow = maxrow
+        self.CutStart = CutStart
+        self.ShowGap = ShowGap
+        self.encloser = encloser
+        self.sample = sample
+        self.Fit = Fit
+        self.Display = Display
+        # The number of lines per 'write' call
+        self.batch = batch
+        self.widths = []
+        self.count = 0
+        self.Ready = False
+        self.header = []
+        self.sampled = []
+        self.rest = iter(())
+    
+    def get_len(self, text):
+        if self.Display:
+            return get_width(text)
+        return len(text)
+    
+    def get_max_len(self):
+        if not self.encloser:
+            return self.maxrow
+        return max(0, self.maxrow - len(self.encloser))
+    
+    def get_cells(self, row, Header=False):
+        cells = [str(cell) for cell in row]
+        if self.maxrow > 0:
+            cells = shorten_many(cells, self.get_max_len(), self.CutStart
+                                ,self.ShowGap, Display=self.Display)
+        if self.encloser and not Header:
+            cells = [Enclose(cell, self.encloser).run() for cell in cells]
+        return cells
+    
+    def update_widths(self, cells):
+        # All rows must have the same number of cells as the longest one
+        if len(cells) > len(self.widths):
+            self.widths += [0] * (len(cells) - len(self.widths))
+        for i in range(len(cells)):
+            width = self.get_len(cells[i])
+            if width > self.widths[i]:
+                self.widths[i] = width
+    
+    def format(self, cells):
+        if len(cells) < len(self.widths):
+            cells = cells + [''] * (len(self.widths) - len(cells))
+        if self.Fit:
+            cells = [shorten(cells[i], self.widths[i], self.CutStart
+                            ,self.ShowGap, Display=self.Display) \
+                     for i in range(len(cells))]
+        if self.Display:
+            cells = [cells[i] + ' ' * (self.widths[i] - get_width(cells[i])) \
+                     for i in range(len(cells))]
+        else:
+            cells = [cells[i].ljust(self.widths[i]) \
+                     for i in range(len(cells))]
+        return self.sep.join(cells) + '\n'
+    
+    def write_lines(self, lines):
+        self.writer.write(''.join(lines))
+    
+    def _get_sample(self, rows):
+        # Return the sampled rows and an iterator over the rest
+        if not self.sample:
+            for row in rows:
+                self.update_widths(self.get_cells(row))
+            return [], iter(rows)
+        rows = iter(rows)
+        sample = []
+        for row in rows:
+            cells = self.get_cells(row)
+            self.update_widths(cells)
+            sample.append(cells)
+            if len(sample) >= self.sample:
+                break
+        return sample, rows
+    
+    def write_rows(self, rows):
+        lines = []
+        for row in rows:
+            lines.append(self.format(self.get_cells(row)))
+            self.count += 1
+            if len(lines) >= self.batch:
+                self.write_lines(lines)
+                lines = []
+        if lines:
+            self.write_lines(lines)
+    
+    def set_widths(self):
+        ''' Calculate column widths once. They stay the same for 'run',
+            all pages and appended rows.
+        '''
+        if self.Ready:
+            return
+        self.header = []
+        if self.headers:
+            self.header = self.get_cells(self.headers, True)
+            self.update_widths(self.header)
+        self.sampled, self.rest = self._get_sample(self.rows)
+        self.Ready = True
+    
+    def get_header(self):
+        self.set_widths()
+        if self.header:
+            return self.format(self.header)
+        return ''
+    
+    def check_rows(self):
+        # Pages need random access, generators can be rendered by 'run' only
+        f = '[SharedQt] table.Stream.check_rows'
+        if hasattr(self.rows, '__len__') and hasattr(self.rows, '__getitem__'):
+            return True
+        mes = _('Only sequences of rows can be split into pages!')
+        Message(f, mes).show_warning()
+        return False
+    
+    def get_total(self):
+        # The number of rows, 'rows' must be a sequence
+        if not self.check_rows():
+            return 0
+        return len(self.rows)
+    
+    def get_slice(self, start, end):
+        return self.rows[start:end]
+    
+    def get_page_count(self, size=20):
+        if not self.check_rows():
+            return 0
+        return max(1, -(-self.get_total() // size))
+    
+    def get_page(self, no, size=20):
+        ''' Render page 'no' (starting from 0) of 'size' rows with a header.
+            Only rows of this page are processed, 'rows' must be a sequence.
+        '''
+        f = '[SharedQt] table.Stream.get_page'
+        if not self.Success:
+            rep.cancel(f)
+            return ''
+        # Do not consume a generator before reporting
+        if not self.check_rows():
+            return ''
+        self.set_widths()
+        if no < 0 or no >= self.get_page_count(size):
+            mes = _('Wrong input data: {}!').format(no)
+            Message(f, mes).show_warning()
+            return ''
+        lines = [self.get_header()]
+        for row in self.get_slice(no * size, (no + 1) * size):
+            lines.append(self.format(self.get_cells(row)))
+        return ''.join(lines)
+    
+    def append(self, rows):
+        ''' Render only new rows using the current widths (calculated by
+            'rows' passed here if there are no widths yet, in which case the
+            header is returned as well). Useful for live output: print the
+            result instead of reprinting the whole table. If there is a
+            writer, lines are written to it.
+        '''
+        f = '[SharedQt] table.Stream.append'
+        if not self.Success:
+            rep.cancel(f)
+            return ''
+        lines = []
+        rows = [self.get_cells(row) for row in rows]
+        if not self.Ready:
+            self.set_widths()
+            for cells in rows:
+                self.update_widths(cells)
+            lines.append(self.get_header())
+        for cells in rows:
+            lines.append(self.format(cells))
+        self.count += len(rows)
+        text = ''.join(lines)
+        if self.writer is not None:
+            self.writer.write(text)
+        return text
+    
+    def run(self):
+        f = '[SharedQt] table.Stream.run'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        writer = self.writer
+        if writer is None:
+            self.writer = io.StringIO()
+        self.set_widths()
+        if self.header:
+            self.write_lines([self.get_header()])
+        self.write_lines([self.format(cells) for cells in self.sampled])
+        self.count = len(self.sampled)
+        self.write_rows(self.rest)
+        mes = _('{} rows have been written')
+        Message(f, mes, args=(self.count,)).show_debug()
+        if writer is None:
+            text = self.writer.getvalue()
+            self.writer = None
+            return text
+        return self.writer
+
+
+
+class Columns(Stream):
+    ''' Render columns without copying them into lists of strings, e.g.:
+        Columns({'No': numbers, 'Value': values}).run()
+        Columns((array1, array2), headers, fl).run()
+        Columns are lists, 'array.array', NumPy arrays (1D columns or a 2D
+        array of columns) or other sequences; keys of a dictionary are used
+        as headers. Widths are calculated by whole columns (vectorized for
+        NumPy), cells are converted to strings and shortened only when
+        written. 'maxrows' limits the number of rows.
+    '''
+    def __init__(self, columns, headers=(), writer=None, sep=' ', maxrow=0
+                ,CutStart=False, ShowGap=True, encloser='', Fit=False
+                ,batch=1000, maxrows=0, Display=False):
+        if isinstance(columns, dict):
+            if not headers:
+                headers = list(columns.keys())
+            columns = list(columns.values())
+        super().__init__ (headers = headers
+                         ,writer = writer
+                         ,sep = sep
+                         ,maxrow = maxrow
+                         ,CutStart = CutStart
+                         ,ShowGap = ShowGap
+                         ,encloser = encloser
+                         ,Fit = Fit
+                         ,batch = batch
+                         ,Display = Display
+                         )
+        self.columns = columns
+        self.maxrows = maxrows
+    
+    def get_width(self, column):
+        if self.maxrows > 0:
+            column = column[:self.maxrows]
+        if not len(column):
+            return 0
+        if is_numpy(column) and not self.Display:
+            import numpy
+            return int(numpy.char.str_len(column.astype(str)).max())
+        return max(map(self.get_len, map(str, column)))
+    
+    def get_widths(self):
+        widths = [self.get_width(column) for column in self.columns]
+        if self.maxrow > 0:
+            max_len = self.get_max_len()
+            widths = [min(width, max_len) for width in widths]
+        if self.encloser:
+            extra = len(Enclose('', self.encloser).run())
+            widths = [width + extra for width in widths]
+        return widths
+    
+    def get_rows(self):
+        # Short columns are padded like in 'Table.add_gap'
+        rows = itertools.zip_longest(*self.columns, fillvalue='')
+        if self.maxrows > 0:
+            rows = itertools.islice(rows, self.maxrows)
+        return rows
+    
+    def _get_sample(self, rows):
+        widths = self.get_widths()
+        # Headers have already been measured
+        for i in range(len(widths)):
+            if i < len(self.widths):
+                self.widths[i] = max(self.widths[i], widths[i])
+            else:
+                self.widths.append(widths[i])
+        return [], self.get_rows()
+    
+    def get_total(self):
+        if not len(self.columns):
+            return 0
+        total = max([len(column) for column in self.columns])
+        if self.maxrows > 0:
+            total = min(total, self.maxrows)
+        return total
+    
+    def get_slice(self, start, end):
+        end = min(end, self.get_total())
+        return itertools.zip_longest(*[column[start:end] \
+                                       for column in self.columns]
+                                    ,fillvalue='')
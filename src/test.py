@@ -770,8 +770,21 @@ class Table:
         print(Table([nos, files], headers, maxrow=50, CutStart=True).run())
         timer.end()
     
+    def run_stream(self):
+        f = '[SharedQt] test.Table.run_stream'
+        from skl_shared_qt.table import Stream
+        from skl_shared_qt.time import Timer
+        rows = ((i + 1, f'word{i}', i * 1.5) for i in range(1000000))
+        headers = (_('#'), _('WORD'), _('VALUE'))
+        timer = Timer(f)
+        timer.start()
+        with open('/tmp/table.txt', 'w') as fl:
+            Stream(rows, headers, fl).run()
+        timer.end()
+    
     def run_all(self):
         self.run_table()
+        self.run_stream()
     
     def run(self):
         self.run_all()
@@ -791,8 +804,27 @@ class List:
         ilist = ls.List(lst1, lst2)
         print(ilist.get_diff())
     
+    def run_benchmark(self):
+        # Set operations on word lists of 10^5 and 10^6 items
+        f = '[SharedQt] test.List.run_benchmark'
+        import time
+        import random
+        import skl_shared_qt.list as ls
+        for count in (100000, 1000000):
+            words = [f'Word{random.randrange(count // 2)}' for i in range(count)]
+            other = words[::-1]
+            for title in ('delete_duplicates', 'get_duplicates_low'
+                         ,'get_shared', 'eats'):
+                ilist = ls.List(words, other)
+                start = time.perf_counter()
+                getattr(ilist, title)()
+                delta = time.perf_counter() - start
+                mes = f'{title}, {count} items: {delta:.3f} s'
+                ms.Message(f, mes).show_info()
+    
     def run_all(self):
         self.get_diff()
+        self.run_benchmark()
     
     def run(self):
         self.run_all()
@@ -937,6 +969,15 @@ class TextFile(Label):
         self.debug.reset(f, self.iread(file).get())
         self.show()
     
+    def load_list(self):
+        f = '[SharedQt] test.TextFile.load_list'
+        input(_('Start {}').format(f))
+        file = '/home/pete/tmp/buffer'
+        iread = self.iread(file)
+        lst = iread.get_list()
+        mes = _('Lines: {}, encoding: {}').format(len(lst), iread.encoding)
+        Message(f, mes).show_debug()
+    
     def load_non_existent(self):
         f = '[SharedQt] test.TextFile.load_non_existent'
         input(_('Start {}').format(f))
@@ -973,6 +1014,7 @@ class TextFile(Label):
     
     def run_all(self):
         self.load()
+        self.load_list()
         self.load_non_existent()
         self.load_no_permissions()
         self.write()
@@ -1005,6 +1047,51 @@ class Config:
 
 
 
+class ImportTime:
+    # Measure a cold start of headless modules in a fresh interpreter
+    def __init__(self):
+        self.headless = ('skl_shared_qt.logic', 'skl_shared_qt.paths'
+                        ,'skl_shared_qt.config', 'skl_shared_qt.text_file'
+                        )
+        self.gui = ('skl_shared_qt.message.info.gui'
+                   ,'skl_shared_qt.graphics.root.controller'
+                   )
+        self.count = 5
+    
+    def measure(self, modules):
+        import sys
+        import subprocess
+        code = 'import sys, time; start = time.perf_counter(); import {}; print(time.perf_counter() - start, "PyQt6" in sys.modules)'
+        code = code.format(', '.join(modules))
+        result = []
+        for i in range(self.count):
+            output = subprocess.run ([sys.executable, '-c', code]
+                                    ,capture_output = True
+                                    ,text = True
+                                    ).stdout.splitlines()
+            # Localization and debug messages are printed as well
+            delta, Qt = output[-1].split()
+            result.append(float(delta))
+        return(min(result), Qt)
+    
+    def run_cold_start(self):
+        f = '[SharedQt] test.ImportTime.run_cold_start'
+        input(_('Start {}').format(f))
+        delta, Qt = self.measure(self.headless)
+        mes = f'Headless: {delta:.3f} s, PyQt6 imported: {Qt}'
+        ms.Message(f, mes).show_info()
+        delta, Qt = self.measure(self.headless + self.gui)
+        mes = f'With GUI backends: {delta:.3f} s, PyQt6 imported: {Qt}'
+        ms.Message(f, mes).show_info()
+    
+    def run_all(self):
+        self.run_cold_start()
+    
+    def run(self):
+        self.run_all()
+
+
+
 class ProgressBar:
     
     def __init__(self):
@@ -1095,4 +1182,5 @@ if __name__ == '__main__':
     #Timer().run()
     #TextFile().run()
     #Config().run()
+    #ImportTime().run()
     ProgressBar().run()
@@ -2,11 +2,362 @@
 # -*- coding: UTF-8 -*-
 
 import os
+import re
+import bz2
+import gzip
+import lzma
+import time
+import zlib
+import mmap
+import array
+import codecs
+import struct
+import secrets
+import itertools
 
 from skl_shared_qt.localize import _
 from skl_shared_qt.message.controller import Message, rep
 from skl_shared_qt.rewrite import rewrite
 
+''' We can try to define an encoding automatically, however, this often
+    spoils some symbols, so we just proceed with the most popular encodings.
+'''
+ENCODINGS = ('UTF-8', 'windows-1251', 'windows-1252')
+# UTF-32 BOMs must be checked before UTF-16 ones since they share a prefix
+BOMS = ((codecs.BOM_UTF32_LE, 'UTF-32'), (codecs.BOM_UTF32_BE, 'UTF-32')
+       ,(codecs.BOM_UTF8, 'UTF-8-SIG'), (codecs.BOM_UTF16_LE, 'UTF-16')
+       ,(codecs.BOM_UTF16_BE, 'UTF-16')
+       )
+# Number of bytes to be checked when guessing an encoding
+SAMPLE_SIZE = 65536
+# Number of bytes to be scanned at once when counting lines
+CHUNK_SIZE = 1048576
+INDEX_EXT = '.idx'
+# Increase if the index format or line breaks change
+INDEX_VERSION = 2
+# Universal newlines, the same as in '_decode' and 'str.splitlines'
+NEWLINE = re.compile(b'\r\n?|\n')
+# A much faster pattern for files without b'\r'
+LF = re.compile(b'\n')
+# Dictzip ('.dz') files are gzip files and can be read sequentially as well
+OPENERS = {'gz': gzip.open, 'dz': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+MAGIC = ((b'\x1f\x8b', 'gz'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'))
+EXTENSIONS = {'.gz': 'gz', '.dz': 'dz', '.bz2': 'bz2', '.xz': 'xz'}
+GZIP_FHCRC = 2
+GZIP_FEXTRA = 4
+GZIP_FNAME = 8
+GZIP_FCOMMENT = 16
+
+
+def count_breaks(chunk, last=b''):
+    # Count universal newlines, 'last' is the last byte of the previous chunk
+    count = chunk.count(b'\n') + chunk.count(b'\r') - chunk.count(b'\r\n')
+    # '\r\n' is split between chunks
+    if last == b'\r' and chunk[:1] == b'\n':
+        count -= 1
+    return count
+
+
+def create_temp(dirname):
+    ''' The same as 'tempfile.mkstemp', but the kernel applies umask to the
+        new file instead of making it owner-only. Changing umask to read it
+        is not an option since other threads may create files meanwhile.
+    '''
+    flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+    while True:
+        tmp = os.path.join(dirname, f'.tmp{secrets.token_hex(6)}.part')
+        try:
+            return os.open(tmp, flags, 0o666), tmp
+        except FileExistsError:
+            continue
+
+
+def detect_compression(file, Magic=True):
+    ''' Return a key of 'OPENERS' or an empty string for plain files. Magic
+        bytes take precedence over the extension; the extension is used alone
+        for files that do not exist yet (e.g., when writing).
+    '''
+    ext = os.path.splitext(file)[1].lower()
+    if Magic and os.path.isfile(file):
+        try:
+            with open(file, 'rb') as fl:
+                prefix = fl.read(6)
+        except OSError:
+            return ''
+        for magic, compression in MAGIC:
+            if prefix.startswith(magic):
+                # Dictzip is a gzip file with a random access table
+                if compression == 'gz' and ext == '.dz':
+                    return 'dz'
+                return compression
+        return ''
+    return EXTENSIONS.get(ext, '')
+
+
+
+def open_text(file, mode='r', compression=''):
+    # Open a UTF-8 text file transparently (de)compressing it
+    if compression:
+        return OPENERS[compression](file, mode + 't', encoding='UTF-8')
+    return open(file, mode, encoding='UTF-8')
+
+
+
+class DictZip:
+    ''' Random access to dictzip ('.dz') files. Dictzip is a gzip file whose
+        deflate stream is split into independently compressed chunks listed
+        in the 'RA' subfield of the gzip header, so reading a range requires
+        decompressing only the chunks that cover it.
+    '''
+    def __init__(self, file):
+        self.Success = True
+        self.file = file
+        self.chlen = 0
+        self.offsets = []
+        self.cache = {}
+    
+    def _skip_string(self, fl):
+        while fl.read(1) not in (b'\0', b''):
+            pass
+    
+    def _parse_extra(self, extra):
+        pos = 0
+        while pos + 4 <= len(extra):
+            si, len_ = extra[pos:pos+2], struct.unpack('<H', extra[pos+2:pos+4])[0]
+            data = extra[pos+4:pos+4+len_]
+            pos += 4 + len_
+            if si != b'RA':
+                continue
+            ver, self.chlen, chcnt = struct.unpack('<HHH', data[:6])
+            return struct.unpack(f'<{chcnt}H', data[6:6+2*chcnt])
+    
+    def load(self):
+        f = '[SharedQt] text_file.DictZip.load'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        try:
+            with open(self.file, 'rb') as fl:
+                header = fl.read(10)
+                if header[:3] != b'\x1f\x8b\x08' or not header[3] & GZIP_FEXTRA:
+                    self.Success = False
+                    mes = _('File "{}" is not a dictzip file!').format(self.file)
+                    Message(f, mes).show_warning()
+                    return
+                xlen = struct.unpack('<H', fl.read(2))[0]
+                sizes = self._parse_extra(fl.read(xlen))
+                if header[3] & GZIP_FNAME:
+                    self._skip_string(fl)
+                if header[3] & GZIP_FCOMMENT:
+                    self._skip_string(fl)
+                if header[3] & GZIP_FHCRC:
+                    fl.read(2)
+                offset = fl.tell()
+        except Exception as e:
+            self.Success = False
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes, True).show_warning()
+            return
+        if not sizes or not self.chlen:
+            self.Success = False
+            mes = _('File "{}" is not a dictzip file!').format(self.file)
+            Message(f, mes).show_warning()
+            return
+        for size in sizes:
+            self.offsets.append((offset, size))
+            offset += size
+        return True
+    
+    def _get_chunk(self, fl, no):
+        if not no in self.cache:
+            # Keep only a few recent chunks, articles are usually read nearby
+            if len(self.cache) >= 8:
+                del self.cache[next(iter(self.cache))]
+            offset, size = self.offsets[no]
+            fl.seek(offset)
+            self.cache[no] = zlib.decompressobj(-zlib.MAX_WBITS).decompress(fl.read(size))
+        return self.cache[no]
+    
+    def read(self, offset, size):
+        # Return 'size' bytes starting at 'offset' of the uncompressed data
+        f = '[SharedQt] text_file.DictZip.read'
+        if not self.Success:
+            rep.cancel(f)
+            return b''
+        if not self.offsets and not self.load():
+            return b''
+        if offset < 0 or size <= 0:
+            rep.wrong_input(f, (offset, size))
+            return b''
+        first = offset // self.chlen
+        last = min((offset + size - 1) // self.chlen, len(self.offsets) - 1)
+        try:
+            with open(self.file, 'rb') as fl:
+                data = b''.join([self._get_chunk(fl, no) \
+                                for no in range(first, last + 1)])
+        except Exception as e:
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes, True).show_warning()
+            return b''
+        start = offset - first * self.chlen
+        return data[start:start+size]
+
+
+
+class Detector:
+    ''' Guess possible encodings of a byte buffer by its BOM or by quickly
+        checking a bounded prefix. The result is a tuple of encodings to be
+        tried in the given order.
+    '''
+    def __init__(self, buffer, size=SAMPLE_SIZE):
+        self.buffer = buffer
+        self.size = size
+    
+    def get_bom(self):
+        prefix = bytes(self.buffer[:4])
+        for bom, encoding in BOMS:
+            if prefix.startswith(bom):
+                return encoding
+    
+    def is_valid(self, sample, encoding):
+        # Do not fail on a multibyte sequence cut by the sample boundary
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(sample, final=False)
+            return True
+        except UnicodeDecodeError:
+            return False
+    
+    def run(self):
+        encoding = self.get_bom()
+        if encoding:
+            return (encoding,)
+        sample = self.buffer[:self.size]
+        return tuple(encoding for encoding in ENCODINGS \
+                     if self.is_valid(sample, encoding))
+
+
+
+class LineIndex:
+    ''' Byte offsets of line starts in a file. The index is built by scanning
+        the mapped file for b'\n', b'\r\n' and b'\r' (which is valid for
+        ASCII-compatible encodings only) and is persisted next to the file (or to 'cache') so
+        that line N of a huge file can be fetched with a single seek.
+    '''
+    def __init__(self, file, cache=''):
+        self.Success = True
+        self.file = file
+        self.offsets = array.array('Q')
+        self.size = 0
+        # The file size and time when the index was built
+        self.stamp = array.array('Q')
+        if cache:
+            self.cache = cache
+        else:
+            self.cache = self.file + INDEX_EXT
+    
+    def get_stamp(self):
+        # The index is considered outdated if the file size or time change
+        istat = os.stat(self.file)
+        self.size = istat.st_size
+        return array.array('Q', (INDEX_VERSION, istat.st_size
+                                ,istat.st_mtime_ns))
+    
+    def _scan(self, imap):
+        # Offsets are collected at the C level without a loop per line
+        self.offsets.append(0)
+        if imap.find(b'\r') == -1:
+            pattern = LF
+        else:
+            pattern = NEWLINE
+        self.offsets.extend(map(re.Match.end, pattern.finditer(imap)))
+        # Do not count an empty line after the trailing line break
+        if self.offsets[-1] == len(imap):
+            self.offsets.pop()
+    
+    def build(self):
+        f = '[SharedQt] text_file.LineIndex.build'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        self.offsets = array.array('Q')
+        try:
+            with open(self.file, 'rb') as fl:
+                # Take the stamp before scanning, so changes made after that
+                # make the saved index outdated
+                istat = os.fstat(fl.fileno())
+                self.stamp = array.array('Q', (INDEX_VERSION, istat.st_size
+                                              ,istat.st_mtime_ns))
+                if not istat.st_size:
+                    return
+                with mmap.mmap(fl.fileno(), 0, access=mmap.ACCESS_READ) as imap:
+                    self.size = len(imap)
+                    self._scan(imap)
+        except Exception as e:
+            self.Success = False
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes, True).show_warning()
+    
+    def load(self):
+        f = '[SharedQt] text_file.LineIndex.load'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        if not os.path.isfile(self.cache):
+            return
+        try:
+            stamp = self.get_stamp()
+            with open(self.cache, 'rb') as fl:
+                header = array.array('Q')
+                header.fromfile(fl, len(stamp))
+                if header != stamp:
+                    mes = _('Index "{}" is outdated')
+                    Message(f, mes, args=(self.cache,)).show_debug()
+                    return
+                count = (os.fstat(fl.fileno()).st_size - fl.tell()) \
+                        // self.offsets.itemsize
+                self.offsets.fromfile(fl, count)
+            return True
+        except Exception as e:
+            # The index is optional, it can always be built again
+            self.offsets = array.array('Q')
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes).show_warning()
+    
+    def save(self):
+        f = '[SharedQt] text_file.LineIndex.save'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        try:
+            with open(self.cache, 'wb') as fl:
+                self.stamp.tofile(fl)
+                self.offsets.tofile(fl)
+            return True
+        except Exception:
+            # Read-only directories should not prevent reading the file
+            mes = _('Unable to write file "{}"!').format(self.cache)
+            Message(f, mes).show_warning()
+    
+    def get_count(self):
+        return len(self.offsets)
+    
+    def get_range(self, no):
+        # Return (start, end) byte offsets of line 'no' (0-based)
+        if no < 0 or no >= len(self.offsets):
+            return
+        start = self.offsets[no]
+        if no + 1 < len(self.offsets):
+            return (start, self.offsets[no+1])
+        return (start, self.size)
+    
+    def run(self):
+        if not self.load():
+            self.build()
+            self.save()
+        return self
+
+
 
 class Read:
 
@@ -21,7 +372,11 @@ class Read:
         self.Empty = False
         self.text = ''
         self.file = ''
+        self.encoding = ''
+        self.compression = ''
         self.lst = []
+        self.index = None
+        self.idictzip = None
     
     def check(self):
         f = '[SharedQt] text_file.Read.check'
@@ -39,24 +394,68 @@ class Read:
             self.Success = False
             mes = _('The object "{}" is not a file!').format(self.file)
             Message(f, mes, True).show_warning()
+            return
+        self.compression = detect_compression(self.file)
         return True
+    
+    def _open(self, mode='rb', encoding=None):
+        # Open the file transparently decompressing it
+        if self.compression:
+            return OPENERS[self.compression](self.file, mode, encoding=encoding)
+        return open(self.file, mode, encoding=encoding)
 
-    def _read(self, encoding):
+    def _decode(self, view):
+        f = '[SharedQt] text_file.Read._decode'
+        if self.encoding:
+            encodings = (self.encoding,)
+        else:
+            encodings = Detector(view).run()
+        ''' The prefix check is not a guarantee, so we quietly try the next
+            encoding if the full text fails to decode.
+        '''
+        for encoding in encodings:
+            try:
+                text = str(view, encoding)
+                self.encoding = encoding
+                # Keep the contract of the text mode (universal newlines)
+                if '\r' in text:
+                    text = text.replace('\r\n', '\n').replace('\r', '\n')
+                return text
+            except UnicodeDecodeError:
+                mes = _('Unable to decode "{}" as {}')
+                Message(f, mes, args=(self.file, encoding)).show_debug()
+        return ''
+    
+    def _read(self):
+        # Map the file once and decode it only once in most cases
         f = '[SharedQt] text_file.Read._read'
         try:
-            with open(self.file, 'r', encoding=encoding) as fl:
-                self.text = fl.read()
+            if self.compression:
+                # Compressed files cannot be mapped, decompress them at once
+                with self._open() as fl:
+                    return self._decode(fl.read())
+            with open(self.file, 'rb') as fl:
+                # Empty files cannot be mapped
+                if not os.fstat(fl.fileno()).st_size:
+                    return ''
+                with mmap.mmap(fl.fileno(), 0, access=mmap.ACCESS_READ) as imap:
+                    with memoryview(imap) as view:
+                        return self._decode(view)
         except Exception as e:
-            # Avoid UnicodeDecodeError, access errors, etc.
+            # Avoid access errors, etc.
             mes = _('Operation has failed!\nDetails: {}').format(e)
             Message(f, mes, True).show_warning()
+        return ''
 
     def delete_bom(self):
         f = '[SharedQt] text_file.Read.delete_bom'
         if not self.Success:
             rep.cancel(f)
             return
-        self.text = self.text.replace('\N{ZERO WIDTH NO-BREAK SPACE}', '')
+        self.text = self._delete_bom(self.text)
+    
+    def _delete_bom(self, text):
+        return text.replace('\N{ZERO WIDTH NO-BREAK SPACE}', '')
 
     def get(self):
         # Return the text from memory (or load the file first)
@@ -68,48 +467,255 @@ class Read:
             self.load()
         return self.text
 
+    def _detect(self):
+        f = '[SharedQt] text_file.Read._detect'
+        try:
+            with self._open() as fl:
+                sample = fl.read(SAMPLE_SIZE)
+        except Exception as e:
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes, True).show_warning()
+            return ''
+        encodings = Detector(sample).run()
+        if encodings:
+            return encodings[0]
+        return ''
+    
+    def get_encoding(self):
+        # Guess the encoding by a file prefix without decoding the whole file
+        f = '[SharedQt] text_file.Read.get_encoding'
+        if not self.Success:
+            rep.cancel(f)
+            return self.encoding
+        if not self.encoding:
+            self.encoding = self._detect()
+        return self.encoding
+    
+    def is_ascii_compatible(self):
+        # Byte-level line scanning is not valid for UTF-16 and UTF-32
+        return not self.get_encoding().startswith(('UTF-16', 'UTF-32'))
+    
+    def _count_lines_stream(self):
+        f = '[SharedQt] text_file.Read._count_lines_stream'
+        count = 0
+        last = b'\n'
+        try:
+            with self._open() as fl:
+                while True:
+                    chunk = fl.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    count += count_breaks(chunk, last)
+                    last = chunk[-1:]
+        except Exception as e:
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes, True).show_warning()
+        # The last line may have no line break
+        if last not in (b'\n', b'\r'):
+            count += 1
+        return count
+    
+    def _count_lines(self):
+        f = '[SharedQt] text_file.Read._count_lines'
+        if self.compression:
+            return self._count_lines_stream()
+        count = 0
+        try:
+            with open(self.file, 'rb') as fl:
+                size = os.fstat(fl.fileno()).st_size
+                if not size:
+                    return 0
+                with mmap.mmap(fl.fileno(), 0, access=mmap.ACCESS_READ) as imap:
+                    pos = 0
+                    last = b''
+                    while pos < size:
+                        chunk = imap[pos:pos+CHUNK_SIZE]
+                        count += count_breaks(chunk, last)
+                        last = chunk[-1:]
+                        pos += CHUNK_SIZE
+                    # The last line may have no line break
+                    if last not in (b'\n', b'\r'):
+                        count += 1
+        except Exception as e:
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes, True).show_warning()
+        return count
+    
     def get_lines(self):
-        # Return a number of lines in the file. Returns 0 for an empty file.
+        ''' Return a number of lines in the file. Returns 0 for an empty file.
+            Only universal newlines ('\n', '\r\n', '\r') are counted unless
+            the text is already loaded.
+        '''
         f = '[SharedQt] text_file.Read.get_lines'
         if not self.Success:
             rep.cancel(f)
             return
-        return len(self.get_list())
+        if self.lst:
+            return len(self.lst)
+        if self.index:
+            return self.index.get_count()
+        if not self.is_ascii_compatible():
+            return len(self.get_list())
+        return self._count_lines()
+    
+    def iter_lines(self):
+        ''' Yield lines one by one without loading the whole file. Line breaks
+            are stripped, like in 'get_list', however, only universal newlines
+            ('\n', '\r\n', '\r') are considered to be line breaks.
+        '''
+        f = '[SharedQt] text_file.Read.iter_lines'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        if self.lst:
+            yield from self.lst
+            return
+        encoding = self.get_encoding()
+        if not encoding:
+            self.fail()
+            return
+        try:
+            with self._open('rt', encoding) as fl:
+                for line in fl:
+                    yield self._delete_bom(line.rstrip('\n'))
+        except Exception as e:
+            # Avoid UnicodeDecodeError, access errors, etc.
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes, True).show_warning()
+    
+    def get_index(self, cache=''):
+        # Build or load the persisted line offset index
+        f = '[SharedQt] text_file.Read.get_index'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        if self.index:
+            return self.index
+        if not self.get_encoding():
+            self.fail()
+            return
+        if not self.is_ascii_compatible():
+            mes = _('Encoding "{}" is not supported!').format(self.encoding)
+            Message(f, mes).show_warning()
+            return
+        if self.compression:
+            # Offsets are not valid for compressed data, see 'get_range'
+            mes = _('Compressed files are not supported!')
+            Message(f, mes).show_warning()
+            return
+        self.index = LineIndex(self.file, cache).run()
+        if not self.index.Success:
+            self.index = None
+        return self.index
+    
+    def get_line(self, no):
+        # Fetch line 'no' (0-based) with a single seek
+        f = '[SharedQt] text_file.Read.get_line'
+        if not self.Success:
+            rep.cancel(f)
+            return ''
+        if self.lst:
+            if 0 <= no < len(self.lst):
+                return self.lst[no]
+            return ''
+        if self.compression or not self.is_ascii_compatible():
+            # Sequential access is the only option here
+            for line in itertools.islice(self.iter_lines(), no, no + 1):
+                return line
+            rep.wrong_input(f, no)
+            return ''
+        if not self.get_index():
+            rep.cancel(f)
+            return ''
+        range_ = self.index.get_range(no)
+        if not range_:
+            rep.wrong_input(f, no)
+            return ''
+        try:
+            with open(self.file, 'rb') as fl:
+                fl.seek(range_[0])
+                line = fl.read(range_[1] - range_[0])
+        except Exception as e:
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes, True).show_warning()
+            return ''
+        # UTF-8-SIG removes BOM only at the start of the line
+        line = line.decode(self.encoding, 'replace').rstrip('\r\n')
+        return self._delete_bom(line)
+    
+    def _read_range(self, offset, size):
+        if self.compression == 'dz':
+            if not self.idictzip:
+                self.idictzip = DictZip(self.file)
+                self.idictzip.load()
+            if self.idictzip.Success:
+                return self.idictzip.read(offset, size)
+        # Seeking gzip/bz2/xz files decompresses everything before 'offset'
+        with self._open() as fl:
+            fl.seek(offset)
+            return fl.read(size)
+    
+    def get_range(self, offset, size):
+        ''' Return text of 'size' bytes starting at 'offset' of uncompressed
+            data, e.g., a dictionary article. Only the chunks covering the
+            range are decompressed in dictzip files.
+        '''
+        f = '[SharedQt] text_file.Read.get_range'
+        if not self.Success:
+            rep.cancel(f)
+            return ''
+        if not self.get_encoding():
+            self.fail()
+            return ''
+        try:
+            data = self._read_range(offset, size)
+        except Exception as e:
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes, True).show_warning()
+            return ''
+        return self._delete_bom(data.decode(self.encoding, 'replace'))
 
     def get_list(self):
         f = '[SharedQt] text_file.Read.get_list'
         if not self.Success:
             rep.cancel(f)
             return self.lst
-        if not self.lst:
-            self.lst = self.get().splitlines()
+        if self.lst:
+            return self.lst
+        if self.text:
+            self.lst = self.text.splitlines()
+            return self.lst
+        ''' Do not keep both the full text and the full list in memory. The
+            text will be loaded again (with the encoding already known) only
+            if it is asked for.
+        '''
+        text = self._read()
+        if not text and not self.Empty:
+            self.fail()
+            return self.lst
+        self.lst = self._delete_bom(text).splitlines()
         # len(None) causes an error
         return self.lst
+    
+    def fail(self):
+        f = '[SharedQt] text_file.Read.fail'
+        ''' The file cannot be read OR the file is empty (we usually don't
+            need empty files)
+            #TODO: Update the message
+        '''
+        self.Success = False
+        mes = _('Unable to read file "{}"!').format(self.file)
+        Message(f, mes, True).show_warning()
 
     def load(self):
         f = '[SharedQt] text_file.Read.load'
         if not self.Success:
             rep.cancel(f)
             return self.text
-        mes = _('Load file "{}"').format(self.file)
-        Message(f, mes).show_info()
-        ''' We can try to define an encoding automatically, however, this often
-            spoils some symbols, so we just proceed with try-except and the
-            most popular encodings.
-        '''
-        self._read('UTF-8')
-        if not self.text:
-            self._read('windows-1251')
-        if not self.text:
-            self._read('windows-1252')
+        Message(f, _('Load file "{}"'), args=(self.file,)).show_info()
+        self.text = self._read()
         if not self.text and not self.Empty:
-            ''' The file cannot be read OR the file is empty (we usually don't
-                need empty files)
-                #TODO: Update the message
-            '''
-            self.Success = False
-            mes = _('Unable to read file "{}"!').format(self.file)
-            Message(f, mes, True).show_warning()
+            self.fail()
             return self.text
         self.delete_bom()
         return self.text
@@ -118,11 +724,15 @@ class Read:
 
 class Write:
 
-    def __init__(self, file, Rewrite=False, Empty=False):
+    def __init__(self, file, Rewrite=False, Empty=False, Atomic=False
+                ,policy=None):
         self.set_values()
         self.file = file
         self.Rewrite = Rewrite
         self.Empty = Empty
+        self.Atomic = Atomic
+        # See 'rewrite.Policy'
+        self.policy = policy
         self.check()
     
     def set_values(self):
@@ -131,6 +741,9 @@ class Write:
         self.file = ''
         self.Rewrite = False
         self.Empty = False
+        self.Atomic = False
+        self.policy = None
+        self.compression = ''
     
     def check(self):
         f = '[SharedQt] text_file.Write.check'
@@ -138,6 +751,12 @@ class Write:
             self.Success = False
             mes = _('Not enough input data!')
             Message(f, mes, True).show_warning()
+            return
+        ''' The file will be compressed according to its extension. '.dz'
+            files are written as plain gzip files (without a random access
+            table), use 'dictzip' to create real dictzip files.
+        '''
+        self.compression = detect_compression(self.file, False)
 
     def _write(self, mode='w'):
         f = '[SharedQt] text_file.Write._write'
@@ -146,10 +765,15 @@ class Write:
             mes = mes.format(mode, 'a, w')
             Message(f, mes, True).show_error()
             return
-        mes = _('Write file "{}"').format(self.file)
-        Message(f, mes).show_info()
+        if mode == 'w':
+            Message(f, _('Write file "{}"'), args=(self.file,)).show_info()
+        else:
+            # Use 'Appender' for frequent appends
+            Message(f, _('Append to file "{}"'), args=(self.file,)).show_debug()
+        if self.Atomic and mode == 'w':
+            return self._write_atomic()
         try:
-            with open(self.file, mode, encoding='UTF-8') as fl:
+            with open_text(self.file, mode, self.compression) as fl:
                 fl.write(self.text)
         except:
             self.Success = False
@@ -157,6 +781,39 @@ class Write:
             Message(f, mes, True).show_error()
         return self.Success
 
+    def _write_atomic(self):
+        ''' Write a temporary file in the same directory and replace the
+            target with it so that a crash cannot leave a truncated file.
+        '''
+        f = '[SharedQt] text_file.Write._write_atomic'
+        dirname = os.path.dirname(os.path.abspath(self.file))
+        tmp = ''
+        try:
+            fd, tmp = create_temp(dirname)
+            if self.compression:
+                with os.fdopen(fd, 'wb') as raw:
+                    # This does not close 'raw'
+                    with OPENERS[self.compression](raw, 'wt', encoding='UTF-8') as fl:
+                        fl.write(self.text)
+                    raw.flush()
+                    os.fsync(raw.fileno())
+            else:
+                with os.fdopen(fd, 'w', encoding='UTF-8') as fl:
+                    fl.write(self.text)
+                    fl.flush()
+                    os.fsync(fl.fileno())
+            # Keep permissions of the original file
+            if os.path.exists(self.file):
+                os.chmod(tmp, os.stat(self.file).st_mode)
+            os.replace(tmp, self.file)
+        except Exception:
+            self.Success = False
+            mes = _('Unable to write file "{}"!').format(self.file)
+            Message(f, mes, True).show_error()
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+        return self.Success
+    
     def append(self, text=''):
         f = '[SharedQt] text_file.Write.append'
         if not self.Success:
@@ -185,8 +842,131 @@ class Write:
             return
         if self.Rewrite:
             return self._write('w')
-        if not rewrite(self.file):
+        if not rewrite(self.file, self.policy):
             mes = _('Operation has been canceled by the user.')
             Message(f, mes).show_info()
             return
         return self._write('w')
+
+
+class Appender:
+    ''' A long-lived buffered writer for appending many small texts, e.g.:
+        with Appender(file, flush_lines=1000) as iappend:
+            iappend.write_many(lines)
+        The file is opened once, and the buffer is flushed after 'flush_lines'
+        writes, 'flush_bytes' characters or 'flush_interval' seconds (0 means
+        no such limit), as well as upon closing.
+    '''
+    def __init__(self, file, flush_lines=0, flush_bytes=65536
+                ,flush_interval=0, sep='\n'):
+        self.Success = True
+        self.file = file
+        self.flush_lines = flush_lines
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.sep = sep
+        self.fl = None
+        self.buffer = []
+        self.size = 0
+        self.flushed = 0
+        self.check()
+    
+    def __enter__(self):
+        self.open()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def check(self):
+        f = '[SharedQt] text_file.Appender.check'
+        if not self.file:
+            self.Success = False
+            mes = _('Not enough input data!')
+            Message(f, mes, True).show_warning()
+    
+    def open(self):
+        f = '[SharedQt] text_file.Appender.open'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        if self.fl:
+            return True
+        Message(f, _('Append to file "{}"'), args=(self.file,)).show_info()
+        try:
+            compression = detect_compression(self.file, False)
+            self.fl = open_text(self.file, 'a', compression)
+            self.flushed = time.monotonic()
+            return True
+        except Exception:
+            self.Success = False
+            mes = _('Unable to write file "{}"!').format(self.file)
+            Message(f, mes, True).show_error()
+    
+    def is_due(self):
+        if self.flush_lines and len(self.buffer) >= self.flush_lines:
+            return True
+        if self.flush_bytes and self.size >= self.flush_bytes:
+            return True
+        if self.flush_interval \
+        and time.monotonic() - self.flushed >= self.flush_interval:
+            return True
+        return False
+    
+    def flush(self):
+        f = '[SharedQt] text_file.Appender.flush'
+        if not self.Success:
+            rep.cancel(f)
+            return
+        if not self.buffer:
+            return True
+        if not self.fl and not self.open():
+            return
+        try:
+            self.fl.write(''.join(self.buffer))
+            self.fl.flush()
+        except Exception:
+            self.Success = False
+            mes = _('Unable to write file "{}"!').format(self.file)
+            Message(f, mes, True).show_error()
+            return
+        self.buffer = []
+        self.size = 0
+        self.flushed = time.monotonic()
+        return True
+    
+    def write(self, text):
+        # Add a separator (a line break by default) after each text
+        if not self.Success:
+            return
+        text = str(text) + self.sep
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.is_due():
+            return self.flush()
+        return True
+    
+    def write_many(self, texts):
+        if not self.Success:
+            return
+        for text in texts:
+            text = str(text) + self.sep
+            self.buffer.append(text)
+            self.size += len(text)
+        if self.is_due():
+            return self.flush()
+        return True
+    
+    def close(self):
+        f = '[SharedQt] text_file.Appender.close'
+        if self.Success:
+            self.flush()
+        if not self.fl:
+            return
+        try:
+            self.fl.close()
+        except Exception as e:
+            self.Success = False
+            mes = _('Operation has failed!\nDetails: {}').format(e)
+            Message(f, mes, True).show_error()
+        self.fl = None
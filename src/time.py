@@ -8,6 +8,7 @@ import datetime
 from skl_shared_qt.localize import _
 from skl_shared_qt.message.controller import Message, rep
 from skl_shared_qt.logic import Text
+from skl_shared_qt.profiler import PROFILER
 
 
 class Timer:
@@ -23,6 +24,8 @@ class Timer:
         delta = float(time.time() - self.startv)
         mes = _('The operation has taken {} s.').format(delta)
         Message(self.func_title, mes).show_debug()
+        if PROFILER.Running:
+            PROFILER.add(self.func_title, delta)
         return delta
 
 